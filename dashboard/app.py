@@ -8,6 +8,7 @@ import sys
 from datetime import datetime
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from paper_trading import ZerodhaLiveAPI
+from reports import reporting
 
 app = Flask(__name__)
 
@@ -59,9 +60,8 @@ def load_portfolio():
         }
 
 def load_trade_history():
-    """Load trade history from portfolio data"""
-    portfolio = load_portfolio()
-    return portfolio.get('trade_history', [])
+    """Load trade history from the JSONL trade log (or legacy portfolio data)"""
+    return reporting.read_trade_history(load_portfolio(), PORTFOLIO_FILE.parent)
 
 def get_current_strategy_status():
     """Get current strategy status"""
@@ -121,11 +121,12 @@ def get_portfolio():
                 live_api = ZerodhaLiveAPI()
                 if live_api.authenticate():
                     live_api.load_instruments()
+                    live_prices = live_api.get_live_prices(list(positions))
                     
                     for symbol, position in positions.items():
                         shares = position.get('shares', 0)
                         avg_price = position.get('avg_price', 0)
-                        current_price = live_api.get_live_price(symbol)
+                        current_price = live_prices.get(symbol, 0)
                         
                         if current_price > 0:
                             market_value = shares * current_price
@@ -231,11 +232,12 @@ def get_positions():
                 live_api = ZerodhaLiveAPI()
                 if live_api.authenticate():
                     live_api.load_instruments()
+                    live_prices = live_api.get_live_prices(list(positions))
                     
                     for symbol, position in positions.items():
                         shares = position.get('shares', 0)
                         avg_price = position.get('avg_price', 0)
-                        current_price = live_api.get_live_price(symbol)
+                        current_price = live_prices.get(symbol, 0)
                         
                         market_value = shares * current_price if current_price > 0 else 0
                         invested_value = shares * avg_price
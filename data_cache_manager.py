@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 import os
 import json
 import pytz
+import threading
 from pathlib import Path
 
 # Force IST timezone
@@ -43,6 +44,10 @@ class DataCacheManager:
         # Metadata tracking
         self.metadata_file = self.cache_dir / 'metadata.json'
         self.metadata = self._load_metadata()
+        self._metadata_lock = threading.Lock()  # downloads may run on worker threads
+        self._market_session = None  # (IST date, open, close), rebuilt when the day changes
+        self._loader = None  # EnhancedHybridDataLoader shared by every download, see _get_loader
+        self._loader_lock = threading.Lock()
         
     def _load_metadata(self) -> Dict:
         """Load metadata about cached data"""
@@ -93,9 +98,15 @@ class DataCacheManager:
         """Check if market is currently open"""
         now_ist = datetime.now(IST)
         
-        # Market hours: 9:15 AM - 3:30 PM IST
-        market_open = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
-        market_close = now_ist.replace(hour=15, minute=30, second=0, microsecond=0)
+        # Market hours: 9:15 AM - 3:30 PM IST (boundaries built once per day)
+        session = self._market_session
+        if session is None or session[0] != now_ist.date():
+            session = self._market_session = (
+                now_ist.date(),
+                now_ist.replace(hour=9, minute=15, second=0, microsecond=0),
+                now_ist.replace(hour=15, minute=30, second=0, microsecond=0),
+            )
+        _, market_open, market_close = session
         
         # Check if weekday (Monday=0, Sunday=6)
         is_weekday = now_ist.weekday() < 5
@@ -134,23 +145,31 @@ class DataCacheManager:
             
             # Update metadata
             key = f"{symbol}_{timeframe}"
-            self.metadata[key] = {
-                'last_update': datetime.now(IST).isoformat(),
-                'rows': len(data),
-                'start_date': str(data.index[0]),
-                'end_date': str(data.index[-1])
-            }
-            self._save_metadata()
+            with self._metadata_lock:
+                self.metadata[key] = {
+                    'last_update': datetime.now(IST).isoformat(),
+                    'rows': len(data),
+                    'start_date': str(data.index[0]),
+                    'end_date': str(data.index[-1])
+                }
+                self._save_metadata()
             
             logging.info(f"[SUCCESS] Cached {len(data)} bars for {symbol} {timeframe}")
         
         return data
     
+    def _get_loader(self):
+        """One Zerodha loader per manager, so its session and instrument token index are built once."""
+        with self._loader_lock:
+            if self._loader is None:
+                from zerodha_loader import EnhancedHybridDataLoader
+                self._loader = EnhancedHybridDataLoader(prefer_zerodha=True)
+            return self._loader
+
     def _download_from_zerodha(self, symbol: str, timeframe: str) -> pd.DataFrame:
         """Download from Zerodha (implementation depends on your loader)"""
         try:
-            from zerodha_loader import EnhancedHybridDataLoader
-            loader = EnhancedHybridDataLoader(prefer_zerodha=True)
+            loader = self._get_loader()
             
             # Map timeframe to Zerodha interval
             interval_map = {
@@ -211,10 +230,11 @@ class DataCacheManager:
                     
                     # Update metadata
                     key = f"{symbol}_{timeframe}"
-                    self.metadata[key]['last_update'] = datetime.now(IST).isoformat()
-                    self.metadata[key]['rows'] = len(updated_data)
-                    self.metadata[key]['end_date'] = str(updated_data.index[-1])
-                    self._save_metadata()
+                    with self._metadata_lock:
+                        self.metadata[key]['last_update'] = datetime.now(IST).isoformat()
+                        self.metadata[key]['rows'] = len(updated_data)
+                        self.metadata[key]['end_date'] = str(updated_data.index[-1])
+                        self._save_metadata()
                     
                     logging.info(f"[SUCCESS] Added {len(new_data)} new bars to {symbol} {timeframe}")
                     return updated_data
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Per-scan exit decisions for open positions.
+
+``eval_exits`` is compiled with Numba when it is installed; without Numba the
+same function runs as plain Python over the arrays, so callers never need to
+care which one they got.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional dependency
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+HOLD = 0
+STOP = 1
+TARGET = 2
+
+
+@njit(cache=True)
+def eval_exits(prices, stops, targets):
+    """Action code per position: STOP if price <= stop, TARGET if price >= target, else HOLD.
+
+    Positions without a price (<= 0) are always HOLD.
+    """
+    codes = np.zeros(prices.shape[0], dtype=np.int8)
+    for i in range(prices.shape[0]):
+        price = prices[i]
+        if price <= 0:
+            continue
+        if price <= stops[i]:
+            codes[i] = STOP
+        elif price >= targets[i]:
+            codes[i] = TARGET
+    return codes
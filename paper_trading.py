@@ -17,21 +17,249 @@ if sys.platform.startswith('win'):
 import pandas as pd
 import numpy as np
 import json
+import pickle
 import time
-import random
-from datetime import datetime, timedelta
+import shutil
+import heapq
+import operator
+import signal
+import atexit
+import queue
+import threading
+from datetime import date, datetime, timedelta
 from pathlib import Path
 import pytz
 import requests
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from functools import lru_cache
+from collections import OrderedDict, deque
+import importlib.util
 from urllib.parse import urlparse, parse_qs
-from kiteconnect import KiteConnect
 import hashlib
-from zerodha_auth import ZerodhaAuth
+from symbol_trie import SymbolTrie
 from reports import reporting
 
+
+def _lazy_import(name: str):
+    """Module whose body runs on first attribute access (keeps kiteconnect/numba off cold start)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+zerodha_auth = _lazy_import('zerodha_auth')  # pulls in kiteconnect
+exit_kernel = _lazy_import('exit_kernel')    # pulls in numba when installed
+
 IST = pytz.timezone('Asia/Kolkata')
 
+try:
+    import orjson  # optional C parser; reads bytes directly
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+
+    def _json_line(obj) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, default=str).encode('utf-8')
+
+    def _json_line(obj) -> bytes:
+        return json.dumps(obj, default=str).encode('utf-8') + b'\n'
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso  # optional C ISO-8601 parser
+except ImportError:
+    _parse_iso = datetime.fromisoformat
+
+# Single background writer for cache/counter files so scans never block on disk.
+# Started lazily: importing this module (e.g. from the dashboard) spawns nothing.
+_persist_queue = queue.Queue()
+_persist_thread = None
+_persist_start_lock = threading.Lock()
+
+
+def _persist_worker():
+    while True:
+        path, payload = _persist_queue.get()
+        try:
+            reporting.atomic_write(path, payload)
+        except Exception as exc:
+            print(f"[PERSIST] Failed to write {path}: {exc}")
+        finally:
+            _persist_queue.task_done()
+
+
+def _persist_async(path: Path, payload: bytes):
+    """Queue an atomic file write; pending writes are flushed at interpreter exit."""
+    global _persist_thread
+    with _persist_start_lock:
+        if _persist_thread is None:
+            _persist_thread = threading.Thread(target=_persist_worker, name='persist-writer', daemon=True)
+            _persist_thread.start()
+            atexit.register(_persist_queue.join)
+    _persist_queue.put((path, payload))
+
+
+@lru_cache(maxsize=256)
+def _read_closes(path: str, mtime_ns: int) -> np.ndarray:
+    with open(path, 'r', encoding='utf-8') as f:
+        close_idx = f.readline().strip().split(',').index('close')
+    try:
+        # Single numeric column, no datetime parsing
+        closes = np.loadtxt(path, delimiter=',', skiprows=1, usecols=close_idx, dtype=np.float64, ndmin=1)
+    except ValueError:
+        # Blank/odd fields: let pandas cope (NaN for missing values)
+        closes = pd.read_csv(path, usecols=['close'])['close'].to_numpy(dtype=np.float64)
+    closes.flags.writeable = False  # shared between callers via the cache
+    return closes
+
+
+@lru_cache(maxsize=8)
+def _market_session(day: date) -> tuple[datetime, datetime]:
+    """NSE cash-market (open, close) for an IST calendar day: 9:15 AM - 3:30 PM."""
+    return (IST.localize(datetime(day.year, day.month, day.day, 9, 15)),
+            IST.localize(datetime(day.year, day.month, day.day, 15, 30)))
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached_closes(path: Path) -> np.ndarray:
+    """Close column of a cached candle CSV; re-parsed only when the file's mtime changes."""
+    return _read_closes(str(path), path.stat().st_mtime_ns)
+
+
+# Parsed candle CSVs kept in memory (LRU). Sized above a full watchlist's files
+# (3 timeframes x ~105 symbols plus open positions) so a scan never evicts its own frames.
+CANDLE_FRAME_CACHE_SIZE = 400
+
+# Parsed candle CSVs by path -> (st_mtime_ns, DataFrame), least recently used first.
+# Signal workers share it, so every access holds _candle_frames_lock.
+_candle_frames: OrderedDict[str, tuple[int, pd.DataFrame]] = OrderedDict()
+_candle_frames_lock = threading.Lock()
+
+
+def _cached_candles(path: Path) -> pd.DataFrame:
+    """Full candle CSV as a DataFrame, re-parsed only when the file's mtime changes.
+
+    The frame is shared between callers: slice it, never modify it in place.
+    """
+    key = str(path)
+    mtime_ns = path.stat().st_mtime_ns
+    with _candle_frames_lock:
+        cached = _candle_frames.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            _candle_frames.move_to_end(key)
+            return cached[1]
+    # Parse outside the lock; a concurrent parse of the same file just stores it twice
+    frame = pd.read_csv(path, index_col='datetime', parse_dates=True)
+    with _candle_frames_lock:
+        _candle_frames[key] = (mtime_ns, frame)
+        _candle_frames.move_to_end(key)
+        while len(_candle_frames) > CANDLE_FRAME_CACHE_SIZE:
+            _candle_frames.popitem(last=False)
+    return frame
+
+
+def _prune_candle_frames(keep: set[str]):
+    """Drop cached frames whose path is not in keep (symbols that left the watchlist)."""
+    with _candle_frames_lock:
+        for key in [k for k in _candle_frames if k not in keep]:
+            del _candle_frames[key]
+
+# Exchange-series suffixes that may trail a symbol (RELIANCEEQ, RELIANCE-EQ)
+_SERIES_SUFFIXES = frozenset({'EQ', '-EQ'})
+
+# Kite quote/instrument endpoints allow 3 requests per second
+KITE_REQUESTS_PER_SEC = 3.0
+
+# Concurrent historical-data downloads in auto_update_data; their Kite calls are paced by
+# zerodha_loader.KITE_REQUESTS_PER_SEC, so extra workers only overlap CSV writes and parsing
+DOWNLOAD_WORKERS = 4
+# Threads for auto_update_data's per-symbol cache file/freshness checks (local disk only)
+FRESHNESS_WORKERS = 16
+
+# Kite LTP accepts many instruments per call; keep requests comfortably sized
+LTP_BATCH_SIZE = 250
+# LTP batches in flight at once when a watchlist spans several (still token-bucket paced)
+LTP_WORKERS = 4
+
+# Coalesce scan-counter writes to at most one per this many seconds
+SCAN_COUNTER_FLUSH_SECS = 60
+
+# Seconds a live price is reused by get_current_price(s) before Kite is asked again
+PRICE_CACHE_TTL_SECS = 30.0
+
+# A streamed tick older than this is treated as stale and re-fetched over HTTP LTP
+TICK_MAX_AGE_SECS = 5.0
+
+# Smallest cash balance (Rs.) worth running entry signals for
+MIN_TRADE_SIZE = 1000
+
+# Local candle cache layout: data_cache/<SYMBOL>/<timeframe>.csv
+DATA_CACHE_DIR = Path('data_cache')
+CACHE_TIMEFRAMES = ('daily', '60min', '15min')
+
+# trade_history is stored column-wise: one list per field, aligned by index
+_TRADE_COLUMNS = ('symbol', 'pnl', 'pnl_pct', 'reason')
+
+# Every closed trade is appended here (one JSON object per line), next to the portfolio
+# file; snapshots record the log's byte length instead of embedding the history
+TRADE_HISTORY_FILENAME = 'trade_history.jsonl'
+# Most recent trades kept in memory for session stats
+TRADE_HISTORY_IN_MEMORY = 200
+
+# Seconds between scans in run()
+SCAN_INTERVAL_SECS = 600
+
+# Uniform draws pre-generated per refill for slippage/spread simulation
+RAND_BUFFER_SIZE = 4096
+
+# Worker threads for per-scan signal generation (CSV reads + pandas indicators)
+SIGNAL_WORKERS = 12
+# Wall-clock budget for a scan's signal phase; stragglers are treated as HOLD
+SIGNAL_TIMEOUT_SECS = 60
+
+# Timestamped portfolio backups: where they go, how often, and how long they are kept
+PORTFOLIO_BACKUP_DIR = Path('Reports Day Trading')
+PORTFOLIO_BACKUP_INTERVAL_SECS = 300  # end-of-day saves ignore the interval
+PORTFOLIO_BACKUP_RETENTION_DAYS = 30
+
+# Newest backups (by mtime) considered when restoring a portfolio snapshot
+SNAPSHOT_BACKUPS_SCANNED = 5
+
+# Local port registered as the Kite app's redirect URL (http://127.0.0.1:<port>/) so login
+# completes without pasting the URL; 0 keeps the copy/paste flow
+KITE_CALLBACK_PORT = int(os.getenv('KITE_CALLBACK_PORT', '0'))
+KITE_CALLBACK_TIMEOUT_SECS = 120
+
+# The instrument master is treated as refreshed daily at this IST hour (same as Kite session expiry)
+INSTRUMENTS_ROLLOVER_HOUR = 6
+
+# Always treated as large caps for slippage, even without sector data
+_BLUE_CHIPS = frozenset({'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK'})
+
+# Row template for print_status holdings; parsed once, filled via format_map
+_POS_FMT = ("   {symbol:<12} | {shares:>3} shares | Entry: Rs.{entry:>7.2f} | Current: Rs.{cur:>7.2f}"
+            " | P&L: {pnl:>+8.0f} ({pnl_pct:>+5.1f}%) | Age: {age}{trail}")
+
 
 class ZerodhaAuthenticationError(RuntimeError):
     """Raised when Zerodha authentication is required before proceeding."""
@@ -44,19 +272,50 @@ class ZerodhaLiveAPI:
     """Professional Zerodha API integration with KiteConnect"""
     
     def __init__(self):
-        self.auth = ZerodhaAuth()
+        self.auth = zerodha_auth.ZerodhaAuth()
         self.kite = None
+        self.api_key = None
+        self.api_secret = None
+        self.access_token = None
         self.instruments = {}  # symbol -> instrument_token mapping
         self.instruments_df = None
         self.valid_symbols = set()
         self.symbol_mapping = {}
+        self.symbol_trie = SymbolTrie()
+        # Struct-of-arrays view of self.instruments for bulk/vectorised lookups
+        self._sym_arr = np.array([], dtype=str)
+        self._tok_arr = np.array([], dtype=np.int64)
+        self._sym_sort = np.array([], dtype=np.intp)  # argsort of _sym_arr
+        self._valid_arr = np.array([], dtype=str)  # _sym_arr[_sym_sort], for isin/searchsorted
+        # Token -> slot index (slot = position in _tok_arr) and per-slot last tick price
+        self._tok_sorted = np.array([], dtype=np.int64)
+        self._tok_slot = np.array([], dtype=np.intp)
+        self._token_slot: dict[int, int] = {}
+        self._slot_price = np.zeros(0, dtype=np.float64)
+        self._slot_time = np.zeros(0, dtype=np.float64)  # monotonic time of each slot's last tick
+        self._resolved: dict[str, str] = {}  # input symbol -> tradingsymbol, this session
         self.stock_universe = {}
         self.sector_mapping = {}
-        self.rate_limit_count = 0
-        self.last_rate_limit_reset = datetime.now()
+        # Flat (symbol, sector, cap) rows of the universe file in file order, plus a
+        # sorted symbol index pointing at each symbol's last row (dict-overwrite semantics)
+        self._universe_arr = np.zeros(0, dtype=[('sym', 'U1'), ('sec', 'U1'), ('cap', 'U1')])
+        self._universe_syms = np.array([], dtype=str)
+        self._universe_rows = np.array([], dtype=np.intp)
+        self._tokens = KITE_REQUESTS_PER_SEC  # token bucket for Kite REST calls
+        self._last_refill = time.monotonic()
+        self._token_lock = threading.Lock()  # bucket is shared by warm-up/worker threads
+        self.session_rejected = False  # set by _kite_call when Zerodha rejects the token; ends run()
+        self._ltp_pool = None  # ThreadPoolExecutor, created on the first multi-batch fetch
+        self.price_cache = {}  # tradingsymbol -> (last_price, monotonic fetch time)
+        self._profile = None  # /user/profile payload captured once per session
+        self.ticker = None  # KiteTicker once start_ticker() runs
+        self._tick_cache = {}  # instrument_token -> (last_price, monotonic tick time)
         self.config_file = Path('zerodha_config.json')
         self.session_file = Path('zerodha_session.json')
-        self.instrument_cache_file = Path('instruments_cache.json')
+        self._session_status_cache = None  # (st_mtime_ns, user_name, created_at, expires_at)
+        self._login_url = None  # (api_key, Kite login URL)
+        self.instrument_cache_file = Path('instruments_cache.pkl')
+        self.legacy_instrument_cache_file = Path('instruments_cache.json')
 
         # Try to attach saved Zerodha session immediately so instrument calls work without extra prompts
         attached = self._auto_attach_session()
@@ -65,9 +324,21 @@ class ZerodhaLiveAPI:
                 "Zerodha authentication required. Run: python authenticate_zerodha.py"
             )
 
-        # Pre-load static resources for symbol validation
-        self.load_stock_universe()
-        self._load_instruments_cache()
+        # Pre-load static resources for symbol validation; the instrument master
+        # download (when the cache is stale) overlaps with the disk reads
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='kite-warmup') as pool:
+            master_future = pool.submit(self._fetch_instrument_master) if self._instrument_cache_stale() else None
+            universe_future = pool.submit(self.load_stock_universe)
+            cache_future = pool.submit(self._load_instruments_cache)
+            universe_future.result()
+            cache_future.result()
+            if master_future is not None:
+                try:
+                    self._apply_instrument_master(master_future.result())
+                except ZerodhaAuthenticationError:
+                    raise  # saved token was revoked early; same outcome as a missing session
+                except Exception as exc:
+                    print(f"[INSTRUMENTS] Failed to refresh instruments: {exc}")
     
     @classmethod
     def setup_config(cls, api_key: str, api_secret: str):
@@ -98,8 +369,7 @@ class ZerodhaLiveAPI:
             if not self.config_file.exists():
                 return False
             
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
+            config = _json_loads(self.config_file.read_bytes())
             
             self.api_key = config.get('api_key')
             self.api_secret = config.get('api_secret')
@@ -137,38 +407,48 @@ class ZerodhaLiveAPI:
             print(f"[INFO] Get both API Key and Secret from: https://kite.trade/")
             return False
         
-        # Step 1: Initialize KiteConnect
-        self.kite = KiteConnect(api_key=api_key)
+        # Step 1: Initialize KiteConnect (an existing client for this key keeps its pooled session)
+        if self.kite is None or getattr(self.kite, 'api_key', None) != api_key:
+            self.kite = zerodha_auth.new_kite_client(api_key)
         
-        # Step 2: Generate login URL
-        login_url = self.kite.login_url()
+        # Step 2: Generate login URL (depends only on api_key, so it is built once per key)
+        if self._login_url is None or self._login_url[0] != api_key:
+            self._login_url = (api_key, self.kite.login_url())
+        login_url = self._login_url[1]
         
         print(f"\n[AUTH] Zerodha Authentication Required")
         print(f"[AUTH] 1. Opening browser for login...")
         print(f"[AUTH] 2. Login with your Zerodha credentials")
         print(f"[AUTH] 3. Authorize the application")
-        print(f"[AUTH] 4. Copy the complete URL after authorization")
-        print("-" * 60)
-        
-        # Open browser
-        webbrowser.open(login_url)
         
-        # Get callback URL from user
-        callback_url = input("[AUTH] Paste the complete redirect URL here: ").strip()
+        # Redirect captured on a local port when the Kite app is set up for it
+        request_token = self._capture_request_token(login_url) if KITE_CALLBACK_PORT else None
         
         # Extract request token
         try:
-            parsed_url = urlparse(callback_url)
-            query_params = parse_qs(parsed_url.query)
-            
-            if 'request_token' not in query_params:
-                raise Exception("Request token not found in URL")
+            if request_token is None:
+                print(f"[AUTH] 4. Copy the complete URL after authorization")
+                print("-" * 60)
+                
+                # Open browser
+                if not KITE_CALLBACK_PORT:
+                    webbrowser.open(login_url)
+                
+                # Get callback URL from user
+                callback_url = input("[AUTH] Paste the complete redirect URL here: ").strip()
+                parsed_url = urlparse(callback_url)
+                query_params = parse_qs(parsed_url.query)
                 
-            request_token = query_params['request_token'][0]
+                if 'request_token' not in query_params:
+                    raise Exception("Request token not found in URL")
+                    
+                request_token = query_params['request_token'][0]
             
             # Step 3: Generate session
             data = self.kite.generate_session(request_token, api_secret=api_secret)
             self.access_token = data["access_token"]
+            # The session response already carries user_name/user_id/broker
+            self._profile = data
             
             # Step 4: Set access token
             self.kite.set_access_token(self.access_token)
@@ -186,6 +466,49 @@ class ZerodhaLiveAPI:
             print(f"[AUTH] Please check your API credentials and try again")
             return False
             
+    def _capture_request_token(self, login_url: str) -> str | None:
+        """Open the login page and receive request_token from Kite's redirect on 127.0.0.1.
+
+        Returns None (caller falls back to pasting the URL) if the port is busy or no
+        redirect arrives within KITE_CALLBACK_TIMEOUT_SECS.
+        """
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        tokens = queue.Queue()
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                token = parse_qs(urlparse(self.path).query).get('request_token', [None])[0]
+                self.send_response(200 if token else 400)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(b'Zerodha login received - you can close this tab.' if token
+                                 else b'No request_token in redirect')
+                if token:
+                    tokens.put(token)
+
+            def log_message(self, format, *args):
+                pass  # keep the console clean
+
+        try:
+            server = HTTPServer(('127.0.0.1', KITE_CALLBACK_PORT), CallbackHandler)
+        except OSError as exc:
+            print(f"[AUTH] Callback server unavailable on port {KITE_CALLBACK_PORT}: {exc}")
+            webbrowser.open(login_url)
+            return None
+
+        threading.Thread(target=server.serve_forever, name='kite-callback', daemon=True).start()
+        try:
+            webbrowser.open(login_url)
+            print(f"[AUTH] 4. Waiting for the redirect on http://127.0.0.1:{KITE_CALLBACK_PORT}/ ...")
+            return tokens.get(timeout=KITE_CALLBACK_TIMEOUT_SECS)
+        except queue.Empty:
+            print(f"[AUTH] No redirect within {KITE_CALLBACK_TIMEOUT_SECS}s")
+            return None
+        finally:
+            server.shutdown()
+            server.server_close()
+
     def _load_existing_session(self) -> bool:
         """Load existing session if valid and test it"""
         try:
@@ -193,8 +516,7 @@ class ZerodhaLiveAPI:
                 print(f"[AUTH] No existing session found")
                 return False
                 
-            with open(self.session_file, 'r') as f:
-                session_data = json.load(f)
+            session_data = _json_loads(self.session_file.read_bytes())
             
             # Check if session has required fields
             if 'access_token' not in session_data or 'api_key' not in session_data:
@@ -223,23 +545,20 @@ class ZerodhaLiveAPI:
             self.access_token = session_data['access_token']
             self.api_secret = session_data.get('api_secret')
             
-            # Initialize KiteConnect with existing token
-            self.kite = KiteConnect(api_key=self.api_key)
+            # Initialize KiteConnect with existing token, keeping an existing client's pooled session
+            if self.kite is None or getattr(self.kite, 'api_key', None) != self.api_key:
+                self.kite = zerodha_auth.new_kite_client(self.api_key)
             self.kite.set_access_token(self.access_token)
             
-            # Test the session by making an API call
-            try:
-                profile = self.kite.profile()
-                expires_at = next_6am.strftime('%Y-%m-%d 06:00:00')
-                print(f"[AUTH] ✅ Session restored for: {profile['user_name']}")
-                print(f"[AUTH] Session expires at: {expires_at}")
-                return True
-                
-            except Exception as api_error:
-                print(f"[AUTH] Session test failed: {api_error}")
-                print(f"[AUTH] Removing invalid session")
-                self.session_file.unlink(missing_ok=True)
-                return False
+            # Trust the known 6 AM expiry instead of probing /user/profile; a token revoked
+            # early is caught by _kite_call on the first real request
+            self._profile = {key: session_data[key] for key in ('user_name', 'user_id', 'broker')
+                             if key in session_data}
+            self.session_rejected = False
+            expires_at = next_6am.strftime('%Y-%m-%d 06:00:00')
+            print(f"[AUTH] ✅ Session restored for: {self._profile.get('user_name', 'Unknown')}")
+            print(f"[AUTH] Session expires at: {expires_at}")
+            return True
             
         except Exception as e:
             print(f"[AUTH] Error loading session: {e}")
@@ -248,8 +567,8 @@ class ZerodhaLiveAPI:
     def _save_session(self):
         """Save session for reuse with comprehensive data"""
         try:
-            # Get user profile for session validation
-            profile = self.kite.profile() if self.kite else {}
+            # Profile captured at login/session check; no extra round-trip here
+            profile = self._profile or {}
             
             # Calculate session expiry (6:00 AM next day for Zerodha)
             now = datetime.now()
@@ -269,8 +588,7 @@ class ZerodhaLiveAPI:
                 'session_version': '2.0'  # For future compatibility
             }
             
-            with open(self.session_file, 'w') as f:
-                json.dump(session_data, f, indent=2)
+            self.session_file.write_bytes(_json_dumps(session_data))
             
             print(f"[AUTH] ✅ Session saved for: {profile.get('user_name', 'Unknown')}")
             print(f"[AUTH] Session valid until: {next_6am.strftime('%Y-%m-%d 06:00:00')}")
@@ -280,18 +598,26 @@ class ZerodhaLiveAPI:
     
     def get_session_status(self):
         """Get current session status"""
-        if not self.session_file.exists():
+        try:
+            mtime_ns = os.stat(self.session_file).st_mtime_ns
+        except FileNotFoundError:
             return {
                 'active': False,
                 'message': 'No session found'
             }
         
         try:
-            with open(self.session_file, 'r') as f:
-                session_data = json.load(f)
-            
-            created_at = datetime.fromisoformat(session_data['created_at'])
-            expires_at = datetime.fromisoformat(session_data['expires_at'])
+            # The session file is parsed only when it changes; polling reuses the parsed fields
+            cached = self._session_status_cache
+            if cached is None or cached[0] != mtime_ns:
+                session_data = _json_loads(self.session_file.read_bytes())
+                cached = self._session_status_cache = (
+                    mtime_ns,
+                    session_data.get('user_name', 'Unknown'),
+                    datetime.fromisoformat(session_data['created_at']),
+                    datetime.fromisoformat(session_data['expires_at']),
+                )
+            _, user_name, created_at, expires_at = cached
             now = datetime.now()
             
             is_active = now < expires_at
@@ -299,7 +625,7 @@ class ZerodhaLiveAPI:
             
             return {
                 'active': is_active,
-                'user_name': session_data.get('user_name', 'Unknown'),
+                'user_name': user_name,
                 'created_at': created_at,
                 'expires_at': expires_at,
                 'time_left': str(time_left).split('.')[0],  # Remove microseconds
@@ -330,7 +656,8 @@ class ZerodhaLiveAPI:
     def _auto_attach_session(self) -> bool:
         """Attach an existing Zerodha session so that instrument lookups work instantly."""
         try:
-            kite = self.auth.get_kite_instance()
+            # Saved-expiry check only, as in _load_existing_session; _kite_call handles rejection
+            kite = self.auth.get_kite_instance(validate=False)
             if kite:
                 self.kite = kite
                 # These attributes are convenient later when refreshing sessions
@@ -348,10 +675,10 @@ class ZerodhaLiveAPI:
             universe_path = Path('stock_universe_by_sector.json')
             if not universe_path.exists():
                 return False
-            data = json.loads(universe_path.read_text(encoding='utf-8'))
+            data = _json_loads(universe_path.read_bytes())
             self.stock_universe = {}
             self.sector_mapping = {}
-            total_symbols = 0
+            rows = []
             for sector, payload in data.items():
                 sector_info = {
                     'description': payload.get('description', ''),
@@ -366,11 +693,21 @@ class ZerodhaLiveAPI:
                     ('SMALL', sector_info['small_cap']),
                 ):
                     for symbol in symbols:
-                        total_symbols += 1
+                        rows.append((symbol, sector, cap_bucket))
                         self.sector_mapping[symbol] = {
                             'sector': sector,
                             'market_cap': cap_bucket,
                         }
+            total_symbols = len(rows)
+            if rows:
+                widths = [max(len(row[i]) for row in rows) for i in range(3)]
+                self._universe_arr = np.array(rows, dtype=[('sym', f'U{widths[0]}'),
+                                                           ('sec', f'U{widths[1]}'),
+                                                           ('cap', f'U{widths[2]}')])
+                # unique() on the reversed array finds each symbol's last row
+                syms, rev_idx = np.unique(self._universe_arr['sym'][::-1], return_index=True)
+                self._universe_syms = syms
+                self._universe_rows = total_symbols - 1 - rev_idx
             if total_symbols:
                 print(f"[UNIVERSE] Loaded {total_symbols} symbols across {len(self.stock_universe)} sectors")
             return bool(total_symbols)
@@ -383,32 +720,41 @@ class ZerodhaLiveAPI:
         try:
             snapshot = {
                 'timestamp': datetime.now(IST).isoformat(),
-                'valid_symbols': sorted(self.valid_symbols),
+                'valid_symbols': list(self.valid_symbols),
                 'symbol_mapping': self.symbol_mapping,
                 'instruments': self.instruments,
+                'symbol_trie': self.symbol_trie.root,
             }
-            self.instrument_cache_file.write_text(json.dumps(snapshot, indent=2), encoding='utf-8')
-            print(f"[CACHE] Saved {len(self.valid_symbols)} symbols to instruments cache")
+            _persist_async(self.instrument_cache_file, pickle.dumps(snapshot, protocol=5))
+            print(f"[CACHE] Writing {len(self.valid_symbols)} symbols to instruments cache")
         except Exception as exc:
             print(f"[CACHE] Unable to save instruments cache: {exc}")
 
     def _load_instruments_cache(self) -> bool:
         """Load instrument metadata from cache if it is still fresh."""
         try:
-            if not self.instrument_cache_file.exists():
+            if self.instrument_cache_file.exists():
+                data = pickle.loads(self.instrument_cache_file.read_bytes())
+            elif self.legacy_instrument_cache_file.exists():
+                # One-time migration from the old indented JSON cache; the JSON file is
+                # tracked in git, so it stays on disk and the pickle simply takes precedence
+                data = _json_loads(self.legacy_instrument_cache_file.read_bytes())
+                legacy_mtime = self.legacy_instrument_cache_file.stat().st_mtime
+                self.instrument_cache_file.write_bytes(pickle.dumps(data, protocol=5))
+                os.utime(self.instrument_cache_file, (legacy_mtime, legacy_mtime))  # keep its age
+                print(f"[CACHE] Migrated {self.legacy_instrument_cache_file} to {self.instrument_cache_file}")
+            else:
                 return False
-            data = json.loads(self.instrument_cache_file.read_text(encoding='utf-8'))
-            timestamp = data.get('timestamp')
-            if timestamp:
-                cached_at = datetime.fromisoformat(timestamp)
-                age_hours = (datetime.now(IST) - cached_at).total_seconds() / 3600
-                if age_hours > 24:
+            age_hours = self._instrument_cache_age_hours()
+            if age_hours is not None:
+                if self._instrument_cache_stale():
                     print(f"[CACHE] Instruments cache is {age_hours:.1f}h old - refresh recommended")
                 else:
                     print(f"[CACHE] Loaded instruments cache ({age_hours:.1f}h old)")
             self.valid_symbols = set(data.get('valid_symbols', []))
             self.symbol_mapping = data.get('symbol_mapping', {})
             self.instruments = data.get('instruments', {})
+            self._index_symbols(data.get('symbol_trie'))
             return bool(self.valid_symbols)
         except Exception as exc:
             print(f"[CACHE] Failed to load instruments cache: {exc}")
@@ -424,49 +770,125 @@ class ZerodhaLiveAPI:
                 print(f"[INSTRUMENTS] No live session - using cached symbols if available")
                 return self._load_instruments_cache()
 
+        # Previous snapshot (in memory or on disk) lets a refresh apply only the delta
+        if not self.valid_symbols:
+            self._load_instruments_cache()
+
         try:
-            print(f"[INSTRUMENTS] Fetching instruments from Zerodha...")
-            nse_instruments = self.kite.instruments("NSE")
-            if not nse_instruments:
-                raise ValueError("Empty response from Zerodha")
-
-            df = pd.DataFrame(nse_instruments)
-            if df.empty:
-                raise ValueError("Instrument dataframe is empty")
-
-            # Keep only equity symbols for NSE
-            equity_df = df[(df['instrument_type'] == 'EQ') & (df['exchange'] == 'NSE')]
-            self.instruments_df = equity_df
-
-            instruments = {}
-            valid_symbols = set()
-            symbol_mapping = {}
-
-            for row in equity_df.itertuples():
-                symbol = getattr(row, 'tradingsymbol')
-                token = int(getattr(row, 'instrument_token'))
-                instruments[symbol] = token
-                valid_symbols.add(symbol)
-
-                # Normalised variations to aid lookups
-                if symbol.endswith('-EQ'):
-                    symbol_mapping[symbol[:-3]] = symbol
-                cleaned = symbol.replace('-', '')
-                if cleaned != symbol:
-                    symbol_mapping[cleaned] = symbol
-
-            self.instruments = instruments
-            self.valid_symbols = valid_symbols
-            self.symbol_mapping = symbol_mapping
-
-            print(f"[INSTRUMENTS] Loaded {len(self.valid_symbols)} NSE equity symbols")
-            self._save_instruments_cache()
+            self._apply_instrument_master(self._fetch_instrument_master())
             return True
 
         except Exception as exc:
             print(f"[INSTRUMENTS] Failed to refresh instruments: {exc}")
             return self._load_instruments_cache()
 
+    def _instrument_cache_age_hours(self) -> float | None:
+        """Age of the instruments cache from its mtime (no file parse); None if absent."""
+        for path in (self.instrument_cache_file, self.legacy_instrument_cache_file):
+            if path.exists():
+                return (time.time() - path.stat().st_mtime) / 3600
+        return None
+
+    def _instrument_cache_stale(self) -> bool:
+        """True when no instruments cache exists or it predates the latest daily rollover."""
+        now = datetime.now(IST)
+        rollover = now.replace(hour=INSTRUMENTS_ROLLOVER_HOUR, minute=0, second=0, microsecond=0)
+        if now < rollover:
+            rollover -= timedelta(days=1)
+        for path in (self.instrument_cache_file, self.legacy_instrument_cache_file):
+            if path.exists():
+                return path.stat().st_mtime < rollover.timestamp()
+        return True
+
+    def _fetch_instrument_master(self) -> list:
+        """Download the raw NSE instrument list (network only, no state changes)."""
+        print(f"[INSTRUMENTS] Fetching instruments from Zerodha...")
+        nse_instruments = self._kite_call('instruments', "NSE")
+        if not nse_instruments:
+            raise ValueError("Empty response from Zerodha")
+        return nse_instruments
+
+    def _apply_instrument_master(self, nse_instruments: list):
+        """Fold a downloaded instrument list into the lookup tables and cache."""
+        df = pd.DataFrame(nse_instruments)
+        if df.empty:
+            raise ValueError("Instrument dataframe is empty")
+
+        # Keep only equity symbols for NSE
+        equity_df = df[(df['instrument_type'] == 'EQ') & (df['exchange'] == 'NSE')]
+        self.instruments_df = equity_df
+
+        sym = equity_df['tradingsymbol'].astype(str).to_numpy()
+        tok = equity_df['instrument_token'].astype(np.int64).to_numpy()
+        instruments = dict(zip(sym.tolist(), tok.tolist()))
+        new_symbols = set(instruments)
+
+        if self.valid_symbols:
+            added = new_symbols - self.valid_symbols
+            removed = self.valid_symbols - new_symbols
+            symbol_mapping = self.symbol_mapping
+            if removed:
+                symbol_mapping = {alias: target for alias, target in symbol_mapping.items()
+                                  if target not in removed}
+            if added:
+                symbol_mapping.update(self._symbol_aliases(pd.Series(sorted(added))))
+        else:
+            added, removed = new_symbols, set()
+            symbol_mapping = self._symbol_aliases(pd.Series(sym))
+
+        tokens_changed = instruments != self.instruments
+        self.instruments = instruments
+        self.valid_symbols = new_symbols
+        self.symbol_mapping = symbol_mapping
+        if added or removed or tokens_changed:
+            self._index_symbols(rebuild_trie=bool(added or removed))
+
+        print(f"[INSTRUMENTS] Loaded {len(self.valid_symbols)} NSE equity symbols "
+              f"(+{len(added)} / -{len(removed)})")
+        if added or removed or tokens_changed:
+            self._save_instruments_cache()
+        elif self.instrument_cache_file.exists():
+            self.instrument_cache_file.touch()  # verified current; resets the staleness clock
+
+    @staticmethod
+    def _symbol_aliases(symbols: pd.Series) -> dict:
+        """Normalised variations ('-EQ'-less, dash-less) that point back at real symbols."""
+        sym = symbols.to_numpy()
+        eq_mask = symbols.str.endswith('-EQ').to_numpy()
+        cleaned = symbols.str.replace('-', '', regex=False).to_numpy()
+        dashed = cleaned != sym
+        aliases = dict(zip(symbols[eq_mask].str[:-3].tolist(), sym[eq_mask].tolist()))
+        aliases.update(zip(cleaned[dashed].tolist(), sym[dashed].tolist()))
+        return aliases
+
+    def _index_symbols(self, trie_root: dict | None = None, rebuild_trie: bool = True):
+        """Rebuild lookup structures derived from instruments/symbol_mapping."""
+        if trie_root:
+            self.symbol_trie = SymbolTrie(trie_root)
+        elif rebuild_trie:
+            self.symbol_trie = SymbolTrie.build(self.valid_symbols, self.symbol_mapping)
+        self._sym_arr = np.array(list(self.instruments), dtype=str)
+        self._tok_arr = np.fromiter(self.instruments.values(), dtype=np.int64, count=len(self.instruments))
+        self._sym_sort = np.argsort(self._sym_arr, kind='stable')
+        self._valid_arr = self._sym_arr[self._sym_sort]
+        self._resolved = {}  # instrument table changed; re-resolve on next use
+        # NSE tokens run into the hundreds of millions, so prices are kept per slot
+        # rather than in an array indexed by raw token
+        self._tok_slot = np.argsort(self._tok_arr, kind='stable')
+        self._tok_sorted = self._tok_arr[self._tok_slot]
+        self._token_slot = dict(zip(self._tok_arr.tolist(), range(len(self._tok_arr))))
+        self._slot_price = np.zeros(len(self._tok_arr), dtype=np.float64)
+        self._slot_time = np.zeros(len(self._tok_arr), dtype=np.float64)
+
+    def tokens_for(self, tradingsymbols) -> np.ndarray:
+        """Instrument tokens for exact tradingsymbols in one searchsorted pass (-1 if unknown)."""
+        query = np.asarray(tradingsymbols, dtype=str)
+        if not len(self._valid_arr) or not query.size:
+            return np.full(query.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._valid_arr, query), len(self._valid_arr) - 1)
+        hit = self._valid_arr[pos] == query
+        return np.where(hit, self._tok_arr[self._sym_sort[pos]], -1)
+
     def validate_symbol(self, symbol: str) -> str | None:
         """Return a vetted Zerodha symbol or None if no match is found."""
         if not symbol:
@@ -475,26 +897,22 @@ class ZerodhaLiveAPI:
         if not self.valid_symbols:
             self.load_all_instruments()
 
+        # Trie holds real symbols and their aliases ('-EQ'-less, dash-less)
         candidate = symbol.strip().upper()
-        if candidate in self.valid_symbols:
-            return candidate
-
-        if candidate in self.symbol_mapping:
-            return self.symbol_mapping[candidate]
+        resolved = self.symbol_trie.get(candidate)
+        if resolved:
+            return resolved
 
-        variations = {
-            candidate.replace('_', '-'),
-            candidate.replace('-', ''),
-            f"{candidate}-EQ" if not candidate.endswith('-EQ') else candidate[:-3],
-        }
-
-        for variant in variations:
-            if variant in self.valid_symbols:
-                return variant
-            if variant in self.symbol_mapping:
-                return self.symbol_mapping[variant]
+        normalised = candidate.replace('_', '-')
+        for variant in (normalised, normalised.replace('-', '')):
+            if variant != candidate:
+                resolved = self.symbol_trie.get(variant)
+                if resolved:
+                    return resolved
 
-        return None
+        # Series-suffixed input (RELIANCEEQ, RELIANCE-EQ): any stored prefix followed by
+        # exactly a series suffix, not just the longest prefix
+        return self.symbol_trie.get_with_suffix(candidate, _SERIES_SUFFIXES)
 
     def validate_watchlist(self, symbols: list[str]) -> dict:
         """Validate a list of symbols and provide mapping details."""
@@ -504,11 +922,19 @@ class ZerodhaLiveAPI:
             'mapped': {},
         }
 
+        raw_symbols = [s for s in symbols if s]
+        if not raw_symbols:
+            return results
+        if not self.valid_symbols:
+            self.load_all_instruments()
+
+        # Exact matches in one vectorised pass; only misses take the trie/variant path
+        normalised = np.char.upper(np.char.strip(np.asarray(raw_symbols, dtype=str)))
+        exact = np.isin(normalised, self._valid_arr)
+
         seen = set()
-        for raw_symbol in symbols:
-            if not raw_symbol:
-                continue
-            validated = self.validate_symbol(raw_symbol)
+        for raw_symbol, candidate, is_exact in zip(raw_symbols, normalised.tolist(), exact.tolist()):
+            validated = candidate if is_exact else self.validate_symbol(raw_symbol)
             if validated:
                 if validated not in seen:
                     results['valid'].append(validated)
@@ -523,13 +949,34 @@ class ZerodhaLiveAPI:
         """Validate symbols and include sector breakdown when available."""
         base = self.validate_watchlist(symbols)
         by_sector: dict[str, list[str]] = {}
-        for symbol in base['valid']:
-            sector_info = self.get_symbol_sector(symbol)
-            sector_key = sector_info.get('sector', 'UNKNOWN') if sector_info else 'UNKNOWN'
+        sectors, _ = self.sectors_for(base['valid'])
+        for symbol, sector_key in zip(base['valid'], sectors.tolist()):
+            if sector_key == 'UNKNOWN':
+                sector_key = self.get_symbol_sector(symbol).get('sector', 'UNKNOWN')
             by_sector.setdefault(sector_key, []).append(symbol)
         base['by_sector'] = by_sector
         return base
 
+    def universe_symbols(self) -> list[str]:
+        """Universe symbols de-duplicated in file order (sector, then large/mid/small)."""
+        if not len(self._universe_arr):
+            return []
+        _, first = np.unique(self._universe_arr['sym'], return_index=True)
+        return self._universe_arr['sym'][np.sort(first)].tolist()
+
+    def sectors_for(self, symbols: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Vectorised (sector, market_cap) arrays for symbols; 'UNKNOWN' where absent."""
+        query = np.asarray(symbols, dtype=str)
+        sectors = np.full(query.shape, 'UNKNOWN', dtype=object)
+        caps = np.full(query.shape, 'UNKNOWN', dtype=object)
+        if query.size and len(self._universe_syms):
+            pos = np.minimum(np.searchsorted(self._universe_syms, query), len(self._universe_syms) - 1)
+            hit = self._universe_syms[pos] == query
+            rows = self._universe_arr[self._universe_rows[pos[hit]]]
+            sectors[hit] = rows['sec']
+            caps[hit] = rows['cap']
+        return sectors, caps
+
     def get_symbol_sector(self, symbol: str) -> dict:
         """Return sector metadata for a symbol if present in the universe file."""
         if symbol in self.sector_mapping:
@@ -539,50 +986,206 @@ class ZerodhaLiveAPI:
             return self.sector_mapping.get(mapped, {})
         return {}
     
-    def get_live_price(self, symbol: str) -> float:
-        """Get real-time price from Zerodha"""
+    def _acquire_token(self):
+        """Block until the Kite rate limit allows another request (token bucket)."""
+        # Sleeping under the lock queues concurrent callers instead of letting them burst
+        with self._token_lock:
+            now = time.monotonic()
+            self._tokens = min(KITE_REQUESTS_PER_SEC,
+                               self._tokens + (now - self._last_refill) * KITE_REQUESTS_PER_SEC)
+            self._last_refill = now
+            if self._tokens < 1.0:
+                time.sleep((1.0 - self._tokens) / KITE_REQUESTS_PER_SEC)
+                self._tokens = 0.0
+                self._last_refill = time.monotonic()
+            else:
+                self._tokens -= 1.0
+
+    def _kite_call(self, method: str, *args):
+        """Rate-limited Kite REST call; a rejected token raises ZerodhaAuthenticationError."""
+        from kiteconnect.exceptions import TokenException
+        self._acquire_token()
         try:
-            # Rate limiting (Zerodha allows 3 requests/second)
-            if self.rate_limit_count >= 2:  # Conservative limit
-                if (datetime.now() - self.last_rate_limit_reset).seconds < 1:
-                    return 0  # Rate limited
-                else:
-                    self.rate_limit_count = 0
-                    self.last_rate_limit_reset = datetime.now()
-            
-            if not self.kite:
-                print(f"[ERROR] Not authenticated")
-                return 0
-            
-            lookup_symbol = symbol
-            if lookup_symbol not in self.instruments:
-                # Try to validate/normalise the symbol and reload instruments if needed
+            return getattr(self.kite, method)(*args)
+        except TokenException as exc:
+            # Logging in again is interactive (browser + input()), so it never runs mid-scan;
+            # the session file stays until authenticate_zerodha.py saves a confirmed new token
+            if not self.session_rejected:
+                self.session_rejected = True
+                print(f"[AUTH] Zerodha rejected the saved session ({exc})")
+            raise ZerodhaAuthenticationError(
+                "Zerodha session rejected. Run: python authenticate_zerodha.py"
+            ) from exc
+
+    def _resolve_instrument(self, symbol: str) -> str | None:
+        """Map a watchlist symbol onto a tradingsymbol present in the instrument table."""
+        resolved = self._resolved.get(symbol)
+        if resolved is not None:
+            return resolved
+        if symbol in self.instruments:
+            resolved = symbol
+        else:
+            # Try to validate/normalise the symbol and reload instruments if needed
+            validated = self.validate_symbol(symbol)
+            if not (validated and validated in self.instruments):
+                self.load_all_instruments()
                 validated = self.validate_symbol(symbol)
-                if validated and validated in self.instruments:
-                    lookup_symbol = validated
-                else:
-                    self.load_all_instruments()
-                    validated = self.validate_symbol(symbol)
-                    if validated and validated in self.instruments:
-                        lookup_symbol = validated
-            
-            if lookup_symbol not in self.instruments:
+            if not (validated and validated in self.instruments):
+                return None
+            resolved = validated
+        self._resolved[symbol] = resolved
+        return resolved
+
+    def get_live_prices(self, symbols: list[str], max_age: float = 1.0) -> dict[str, float]:
+        """Get real-time prices for many symbols using batched LTP calls.
+
+        Prices fetched less than ``max_age`` seconds ago are served from price_cache.
+        """
+        prices = {}
+        if not self.kite:
+            print(f"[ERROR] Not authenticated")
+            return prices
+
+        lookup = {}  # requested symbol -> tradingsymbol
+        for symbol in dict.fromkeys(symbols):
+            resolved = self._resolve_instrument(symbol)
+            if resolved:
+                lookup[symbol] = resolved
+            else:
                 print(f"[ERROR] Instrument token not found for {symbol}")
-                return 0
 
-            instrument_token = self.instruments[lookup_symbol]
+        fetched = {}
+        tradingsymbols = []
+        now = time.monotonic()
+        for s in dict.fromkeys(lookup.values()):
+            # Streaming ticks first; HTTP for symbols with no recent tick (stalled stream)
+            tick = self._tick_cache.get(self.instruments[s]) if self.ticker is not None else None
+            if tick and (now - tick[1]) < TICK_MAX_AGE_SECS:
+                fetched[s] = tick[0]
+                continue
+            entry = self.price_cache.get(s)
+            if entry and (now - entry[1]) < max_age:
+                fetched[s] = entry[0]
+            else:
+                tradingsymbols.append(s)
+
+        chunks = [tradingsymbols[start:start + LTP_BATCH_SIZE]
+                  for start in range(0, len(tradingsymbols), LTP_BATCH_SIZE)]
+        if len(chunks) > 1:
+            if self._ltp_pool is None:
+                self._ltp_pool = ThreadPoolExecutor(max_workers=LTP_WORKERS, thread_name_prefix='kite-ltp')
+            results = self._ltp_pool.map(self._fetch_ltp_batch, chunks)
+        else:
+            results = map(self._fetch_ltp_batch, chunks)
+        for batch_prices, fetched_at in results:
+            for s, price in batch_prices.items():
+                fetched[s] = price
+                self.price_cache[s] = (price, fetched_at)
+
+        for symbol, tradingsymbol in lookup.items():
+            if tradingsymbol in fetched:
+                prices[symbol] = fetched[tradingsymbol]
+        return prices
+
+    def _fetch_ltp_batch(self, chunk: list[str]) -> tuple[dict, float]:
+        """One rate-limited kite.ltp() call: ({tradingsymbol: last_price}, monotonic fetch time)."""
+        try:
+            quote = self._kite_call('ltp', [f"NSE:{s}" for s in chunk])
+        except Exception as e:
+            print(f"[ZERODHA ERROR] LTP batch of {len(chunk)}: {e}")
+            return {}, 0.0
+        fetched_at = time.monotonic()
+        prices = {}
+        for s in chunk:
+            q = quote.get(f"NSE:{s}")
+            if q:
+                prices[s] = q["last_price"]
+        return prices, fetched_at
+
+    def start_ticker(self, symbols: list[str]) -> bool:
+        """Subscribe symbols on Kite's WebSocket so get_live_prices reads pushed ticks."""
+        if self.ticker is not None:
+            return True
+        api_key = getattr(self, 'api_key', None)
+        access_token = getattr(self, 'access_token', None)
+        if not (api_key and access_token):
+            print(f"[TICKER] No session credentials - staying on HTTP LTP")
+            return False
 
-            # Get live quote
-            quote = self.kite.ltp(f"NSE:{lookup_symbol}")
-            
-            if f"NSE:{lookup_symbol}" in quote:
-                price = quote[f"NSE:{lookup_symbol}"]["last_price"]
-                self.rate_limit_count += 1
-                print(f"[ZERODHA] {lookup_symbol}: Rs.{price:.2f} (REAL-TIME)")
-                return price
-            
-            return 0
-            
+        resolved = [s for s in map(self._resolve_instrument, dict.fromkeys(symbols)) if s]
+        token_arr = self.tokens_for(resolved)
+        tokens = token_arr[token_arr >= 0].tolist()
+        if not tokens:
+            return False
+
+        def on_ticks(ws, ticks):
+            received_at = time.monotonic()
+            for tick in ticks:
+                self._tick_cache[tick['instrument_token']] = (tick['last_price'], received_at)
+                slot = self._token_slot.get(tick['instrument_token'])
+                if slot is not None:
+                    self._slot_price[slot] = tick['last_price']
+                    self._slot_time[slot] = received_at
+
+        def on_connect(ws, response):
+            ws.subscribe(tokens)
+            ws.set_mode(ws.MODE_LTP, tokens)
+            print(f"[TICKER] Subscribed to {len(tokens)} instruments")
+
+        def on_close(ws, code, reason):
+            # Drop ticks while disconnected so lookups fall back to HTTP LTP
+            self._tick_cache.clear()
+            self._slot_price[:] = 0.0
+            print(f"[TICKER] Connection closed ({code}): {reason}")
+
+        try:
+            from kiteconnect import KiteTicker
+            ticker = KiteTicker(api_key, access_token)
+            ticker.on_ticks = on_ticks
+            ticker.on_connect = on_connect
+            ticker.on_close = on_close
+            ticker.connect(threaded=True)
+        except Exception as exc:
+            print(f"[TICKER] Unable to start tick stream: {exc}")
+            return False
+        self.ticker = ticker
+        return True
+
+    def stop_ticker(self):
+        """Close the tick stream, if any."""
+        if self.ticker is None:
+            return
+        try:
+            self.ticker.close()
+        except Exception as exc:
+            print(f"[TICKER] Error while closing tick stream: {exc}")
+        self.ticker = None
+        self._tick_cache.clear()
+        self._slot_price[:] = 0.0
+
+    def get_live_prices_arr(self, tokens: np.ndarray) -> np.ndarray:
+        """Last tick prices aligned with an int64 token array (0.0 = no recent tick / unknown).
+
+        Pure NumPy in and out so njit-compiled strategy kernels can consume it.
+        """
+        tokens = np.asarray(tokens, dtype=np.int64)
+        prices = np.zeros(tokens.shape, dtype=np.float64)
+        if not tokens.size or not len(self._tok_sorted):
+            return prices
+        pos = np.minimum(np.searchsorted(self._tok_sorted, tokens), len(self._tok_sorted) - 1)
+        hit = self._tok_sorted[pos] == tokens
+        slots = self._tok_slot[pos[hit]]
+        fresh = (time.monotonic() - self._slot_time[slots]) < TICK_MAX_AGE_SECS
+        prices[hit] = np.where(fresh, self._slot_price[slots], 0.0)
+        return prices
+
+    def get_live_price(self, symbol: str, max_age: float = 1.0) -> float:
+        """Get real-time price from Zerodha"""
+        try:
+            price = self.get_live_prices([symbol], max_age=max_age).get(symbol, 0)
+            if price:
+                print(f"[ZERODHA] {symbol}: Rs.{price:.2f} (REAL-TIME)")
+            return price
         except Exception as e:
             print(f"[ZERODHA ERROR] {symbol}: {e}")
             return 0
@@ -590,15 +1193,14 @@ class ZerodhaLiveAPI:
     def is_market_open(self) -> bool:
         """Check if market is currently open"""
         now = datetime.now(IST)
-        market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-        market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-        is_weekday = now.weekday() < 5
-        return is_weekday and market_open <= now <= market_close
+        market_open, market_close = _market_session(now.date())
+        return now.weekday() < 5 and market_open <= now <= market_close
     
     def get_profile(self):
         """Get user profile for verification"""
         try:
             if self.kite:
+                self._acquire_token()
                 return self.kite.profile()
         except Exception as e:
             print(f"[PROFILE ERROR] {e}")
@@ -611,24 +1213,35 @@ class PerfectTraderPaperTrading:
     """
     
     def __init__(self, initial_capital: float = 250000, use_live_data: bool = True, force_fresh_start: bool = False,
-                 dry_run: bool = False, allow_after_hours: bool = False):
+                 dry_run: bool = False, allow_after_hours: bool = False, verbose: bool = False):
         # Live data configuration
         self.use_live_data = use_live_data
         self.live_api = None
-        self.price_cache = {}  # Cache recent prices to reduce API calls
-        self.last_cache_update = {}
+        self.price_cache = {}  # symbol -> (price, time.monotonic() of last live fetch)
 
         # Trading mode controls
         self.enable_trading = not dry_run  # can be overridden by market-hours logic
         self.dry_run_configured = dry_run
         self.allow_after_hours = allow_after_hours
+        self.verbose = verbose  # print scan rows as they happen instead of once per scan
+        self._stop_event = threading.Event()  # set by stop()/SIGTERM to end run() promptly
 
         # Initialize base portfolio defaults BEFORE loading saved state
         self.initial_capital = initial_capital
         self.capital = initial_capital
         self.available_capital = initial_capital
         self.positions = {}
-        self.trade_history = []
+        self._pos_dirty = True  # SoA mirror of positions is rebuilt lazily after any mutation
+        self.trade_history = {col: [] for col in _TRADE_COLUMNS}
+        self._signal_cache = {}  # symbol -> (candle file mtimes, signal dict), see get_signal
+        self._scan_log = None  # list while scan_and_trade buffers output, else None (print directly)
+        self._signal_pool = None  # ThreadPoolExecutor, created on the first _signals_for call
+        self._signal_running = {}  # symbol -> future that outlived its scan's timeout
+        self._pending_recovery = {}  # symbol -> missing timeframes, queued by signal workers
+        self._recovery_lock = threading.Lock()
+        self._thread_role = threading.local()  # .signal_worker is True on _signal_pool threads
+        # Trades since the last snapshot; written when the scan that made them ends
+        self._portfolio_dirty = False
 
     # Initialize live API if requested (now handled by main() authentication)
         if use_live_data:
@@ -652,23 +1265,37 @@ class PerfectTraderPaperTrading:
         
         # Portfolio persistence files
         self.portfolio_file = Path('paper_trading_portfolio.json')
+        self.trade_history_file = self.portfolio_file.parent / TRADE_HISTORY_FILENAME
+        self._trade_log_size = self._trade_log_length()  # bytes of the log covered by our state
         self.daily_state_file = Path('daily_portfolio_state.json')
+        self._last_saved_hash = None
+        self._last_backup_at = None
+        self._last_backup_hash = None
         
         # Store the force_fresh_start flag
         self.force_fresh_start = force_fresh_start
         
         # Load existing portfolio (if available) to override defaults
         self._load_portfolio_state()
+        if not dry_run:  # a dry run never deletes portfolio history
+            self._prune_portfolio_backups()
         
         # Load config and build validated watchlist
-        with open('hybrid_config.json', 'r') as f:
-            self.config = json.load(f)
+        self.config = _json_loads(Path('hybrid_config.json').read_bytes())
+        self._cfg_sig = self._config_signature(self.config.get('watchlist', []),
+                                               self.config.get('sector_mapping', {}))
 
         self.watchlist = []
         self.sector_mapping = {}
         self._load_and_validate_watchlist()
         self.max_positions = self.config.get('max_positions', 20)
+        self.min_trade_size = self.config.get('min_trade_size', MIN_TRADE_SIZE)
         self.risk_per_trade = 0.01
+
+        # Friction RNG: optional 'random_seed' in config makes slippage reproducible
+        self._rng = np.random.default_rng(self.config.get('random_seed'))
+        self._rand_buf = self._rng.random(RAND_BUFFER_SIZE)
+        self._rand_idx = 0
         
         # Costs
         self.transaction_cost = 0.002
@@ -680,7 +1307,7 @@ class PerfectTraderPaperTrading:
             self.winning_trades = 0
         
         self.session_start_time = datetime.now(IST)
-        self.last_trading_date = datetime.now(IST).date()
+        self.last_trading_date = self.session_start_time.date()
         
         # Try to load MTFA strategy
         self.strategy = self._load_strategy()
@@ -688,13 +1315,19 @@ class PerfectTraderPaperTrading:
         # Scan counter persistence
         self.scan_counter_file = Path('scan_counter.json')
         self.session_scan_count = 0
+        self._scan_counter_data = None  # in-memory copy; flushed periodically and at exit
+        self._scan_counter_dirty = False
+        self._scan_counter_last_flush = time.monotonic()
+        atexit.register(self._flush_scan_counter, wait=True)
+        # Registered last: the snapshot needs the persistence state set up above
+        atexit.register(self._flush_portfolio_state)
 
     def _load_scan_counter(self) -> dict:
         """Load or initialize the daily scan counter (per local IST day)."""
         today = datetime.now(IST).date().isoformat()
         try:
             if self.scan_counter_file.exists():
-                data = json.load(self.scan_counter_file.open('r', encoding='utf-8'))
+                data = _json_loads(self.scan_counter_file.read_bytes())
                 # Reset if date changed
                 if data.get('date') != today:
                     data = {'date': today, 'count': 0}
@@ -706,43 +1339,47 @@ class PerfectTraderPaperTrading:
 
     def _save_scan_counter(self, data: dict):
         try:
-            json.dump(data, self.scan_counter_file.open('w', encoding='utf-8'), indent=2)
+            _persist_async(self.scan_counter_file, _json_dumps(data))
         except Exception:
             pass
 
     def _increment_daily_scan_counter(self) -> int:
         """Increment and return today's scan count (persistent)."""
-        data = self._load_scan_counter()
+        today = datetime.now(IST).date().isoformat()
+        data = self._scan_counter_data
+        if data is None or data.get('date') != today:
+            data = self._scan_counter_data = self._load_scan_counter()
         data['count'] = int(data.get('count', 0)) + 1
-        self._save_scan_counter(data)
+        self._scan_counter_dirty = True
+        if time.monotonic() - self._scan_counter_last_flush >= SCAN_COUNTER_FLUSH_SECS:
+            self._flush_scan_counter()
         return data['count']
 
+    def _flush_scan_counter(self, wait: bool = False):
+        """Write the in-memory scan counter if it changed since the last flush."""
+        if self._scan_counter_dirty and self._scan_counter_data is not None:
+            self._save_scan_counter(dict(self._scan_counter_data))
+            self._scan_counter_dirty = False
+        self._scan_counter_last_flush = time.monotonic()
+        if wait:
+            _persist_queue.join()
+
     def _load_and_validate_watchlist(self):
         """Load watchlist symbols and ensure they match live market tickers."""
         fallback_watchlist = ['RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK', 'HINDUNILVR', 'SBIN', 'BHARTIARTL', 'ITC', 'KOTAKBANK']
-        original_watchlist = list(self.config.get('watchlist', []))
+        original_watchlist = list(dict.fromkeys(self.config.get('watchlist', [])))
         watchlist_source = 'hybrid_config.json'
 
         # If sector universe is available, prefer that so symbols stay curated
         if self.live_api and self.live_api.stock_universe:
-            combined = []
-            sector_mapping = {}
-            for sector, payload in self.live_api.stock_universe.items():
-                for cap_bucket in ('large_cap', 'mid_cap', 'small_cap'):
-                    symbols = payload.get(cap_bucket, [])
-                    if not isinstance(symbols, list):
-                        continue
-                    bucket_label = cap_bucket.replace('_cap', '').upper()
-                    for symbol in symbols:
-                        if symbol not in combined:
-                            combined.append(symbol)
-                            sector_mapping[symbol] = {
-                                'sector': sector,
-                                'market_cap': bucket_label,
-                            }
+            combined = self.live_api.universe_symbols()
             if combined:
+                sectors, caps = self.live_api.sectors_for(combined)
                 original_watchlist = combined
-                self.sector_mapping = sector_mapping
+                self.sector_mapping = {
+                    symbol: {'sector': sector, 'market_cap': cap}
+                    for symbol, sector, cap in zip(combined, sectors.tolist(), caps.tolist())
+                }
                 watchlist_source = 'stock_universe_by_sector.json'
 
         if not original_watchlist:
@@ -750,7 +1387,7 @@ class PerfectTraderPaperTrading:
             original_watchlist = fallback_watchlist[:]
 
         validation_result = None
-        final_watchlist = list(dict.fromkeys(original_watchlist))
+        final_watchlist = original_watchlist
 
         if self.live_api:
             self.live_api.load_all_instruments()
@@ -765,14 +1402,14 @@ class PerfectTraderPaperTrading:
 
                 # Rebuild sector mapping for valid symbols only
                 validated_mapping = {}
-                for symbol in final_watchlist:
-                    sector_info = self.live_api.get_symbol_sector(symbol)
-                    if not sector_info:
-                        sector_info = self.sector_mapping.get(symbol, {'sector': 'UNKNOWN', 'market_cap': 'UNKNOWN'})
-                    validated_mapping[symbol] = {
-                        'sector': sector_info.get('sector', 'UNKNOWN'),
-                        'market_cap': sector_info.get('market_cap', 'UNKNOWN'),
-                    }
+                sectors, caps = self.live_api.sectors_for(final_watchlist)
+                for symbol, sector, cap in zip(final_watchlist, sectors.tolist(), caps.tolist()):
+                    if sector == 'UNKNOWN':
+                        sector_info = (self.live_api.get_symbol_sector(symbol)
+                                       or self.sector_mapping.get(symbol, {'sector': 'UNKNOWN', 'market_cap': 'UNKNOWN'}))
+                        sector = sector_info.get('sector', 'UNKNOWN')
+                        cap = sector_info.get('market_cap', 'UNKNOWN')
+                    validated_mapping[symbol] = {'sector': sector, 'market_cap': cap}
                 self.sector_mapping = validated_mapping
             except Exception as exc:
                 print(f"[WATCHLIST] Validation failed: {exc}")
@@ -791,35 +1428,69 @@ class PerfectTraderPaperTrading:
             }
 
         self.watchlist = final_watchlist
+        caps = {}
+        for symbol, info in self.sector_mapping.items():
+            caps.setdefault(info.get('market_cap'), []).append(symbol)
+        self._large_caps = _BLUE_CHIPS.union(caps.get('LARGE', ()))
+        self._mid_caps = frozenset(caps.get('MID', ()))
+        self._small_caps = frozenset(caps.get('SMALL', ()))
+        self._cache_paths = {
+            symbol: {tf: DATA_CACHE_DIR / symbol / f"{tf}.csv" for tf in CACHE_TIMEFRAMES}
+            for symbol in self.watchlist
+        }
+        # Frames for symbols no longer watched or held are not worth keeping resident
+        _prune_candle_frames({str(path)
+                              for symbol in [*self.watchlist, *self.positions]
+                              for path in self._cache_paths_for(symbol).values()})
+        # Scan row prefixes "[  i/N] SYMBOL C" (C = L/M/S by position: 35 large, 35 mid, rest small)
+        total = len(self.watchlist)
+        self._scan_labels = [
+            f"[{i:3}/{total}] {symbol:<12} {'L' if i <= 35 else 'M' if i <= 70 else 'S'}"
+            for i, symbol in enumerate(self.watchlist, 1)
+        ]
         print(f"[WATCHLIST] Ready with {len(self.watchlist)} symbols ({watchlist_source})")
 
         # Persist validated watchlist so other modules (like auto_update_data) pick up the latest list
         self._persist_watchlist_update(watchlist_source, validation_result)
 
+    @staticmethod
+    def _config_signature(watchlist, sector_mapping: dict) -> tuple:
+        """Hashable summary of watchlist + sector mapping; insensitive to mapping key order."""
+        return (
+            tuple(watchlist),
+            tuple(sorted((symbol, info.get('sector'), info.get('market_cap'))
+                         for symbol, info in sector_mapping.items())),
+        )
+
+    def _cache_paths_for(self, symbol: str) -> dict:
+        """Timeframe -> cached CSV path for symbol; built on first use for non-watchlist symbols."""
+        paths = self._cache_paths.get(symbol)
+        if paths is None:
+            paths = {tf: DATA_CACHE_DIR / symbol / f"{tf}.csv" for tf in CACHE_TIMEFRAMES}
+            self._cache_paths[symbol] = paths
+        return paths
+
     def _persist_watchlist_update(self, source: str, validation_result: dict | None):
         """Write the validated watchlist back to the config with a timestamp."""
+        new_sig = self._config_signature(self.watchlist, self.sector_mapping)
+        if new_sig == self._cfg_sig:
+            # Nothing material changed; leave config untouched to avoid noisy backups
+            return
+
         config_path = Path('hybrid_config.json')
         try:
-            existing_config = json.loads(config_path.read_text(encoding='utf-8')) if config_path.exists() else {}
+            raw = config_path.read_bytes() if config_path.exists() else b''
         except Exception:
-            existing_config = {}
-
-        needs_write = (
-            existing_config.get('watchlist') != self.watchlist
-            or existing_config.get('sector_mapping') != self.sector_mapping
-        )
-
-        if not needs_write:
-            # Nothing material changed; leave config untouched to avoid noisy backups
-            return
+            raw = b''
 
         backup_path = None
+        now = datetime.now(IST)
 
-        if config_path.exists():
+        if raw:
             try:
-                timestamp = datetime.now(IST).strftime('%Y%m%d_%H%M%S')
+                timestamp = now.strftime('%Y%m%d_%H%M%S')
                 backup_path = config_path.with_name(f"hybrid_config_backup_{timestamp}.json")
-                backup_path.write_text(config_path.read_text(encoding='utf-8'), encoding='utf-8')
+                backup_path.write_bytes(raw)
             except Exception as exc:
                 print(f"[CONFIG] Failed to create config backup: {exc}")
                 backup_path = None
@@ -827,7 +1498,7 @@ class PerfectTraderPaperTrading:
         self.config['watchlist'] = self.watchlist
         self.config['sector_mapping'] = self.sector_mapping
         metadata = {
-            'last_validated': datetime.now(IST).isoformat(),
+            'last_validated': now.isoformat(),
             'source': source,
             'symbol_count': len(self.watchlist),
         }
@@ -837,7 +1508,8 @@ class PerfectTraderPaperTrading:
         self.config['watchlist_metadata'] = metadata
 
         try:
-            config_path.write_text(json.dumps(self.config, indent=2), encoding='utf-8')
+            config_path.write_bytes(_json_dumps(self.config))
+            self._cfg_sig = new_sig
             if backup_path:
                 print(f"[CONFIG] Watchlist updated and saved ({backup_path.name} backup)")
             else:
@@ -848,31 +1520,26 @@ class PerfectTraderPaperTrading:
     def _print_session_metrics(self):
         """Print capital usage, P&L, and open positions before scans begin."""
         try:
-            utilisation = 0.0
-            holdings_details = []
+            symbols, qty_list, entry_list = [], [], []
             for symbol, pos in self.positions.items():
                 qty = pos.get('shares') or pos.get('quantity') or pos.get('qty', 0)
                 if not qty:
                     continue
-                qty = float(qty)
-                entry_price = float(pos.get('avg_price', pos.get('entry_price', 0)))
-                current_price = self.get_current_price(symbol)
-                if current_price <= 0:
-                    current_price = entry_price
-                current_value = qty * current_price
-                utilised_entry = qty * entry_price
-                utilisation += current_value
-                pnl = current_value - utilised_entry
-                pnl_pct = (pnl / utilised_entry * 100) if utilised_entry else 0.0
-                holdings_details.append({
-                    'symbol': symbol,
-                    'qty': qty,
-                    'entry': entry_price,
-                    'current': current_price,
-                    'value': current_value,
-                    'pnl': pnl,
-                    'pnl_pct': pnl_pct,
-                })
+                symbols.append(symbol)
+                qty_list.append(qty)
+                entry_list.append(pos.get('avg_price', pos.get('entry_price', 0)))
+
+            qtys = np.asarray(qty_list, dtype=np.float64)
+            entries = np.asarray(entry_list, dtype=np.float64)
+            live_prices = self.get_current_prices(symbols)
+            prices = np.asarray([live_prices.get(s, 0) for s in symbols], dtype=np.float64)
+            prices = np.where(prices > 0, prices, entries)
+            current_value = qtys * prices
+            utilised = qtys * entries
+            pnl = current_value - utilised
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pnl_pct = np.where(utilised > 0, pnl / utilised * 100, 0.0)
+            utilisation = float(current_value.sum())
 
             total_value = self.available_capital + utilisation
             total_pnl = total_value - self.initial_capital
@@ -882,13 +1549,14 @@ class PerfectTraderPaperTrading:
             print(f"[CAPITAL] Available: Rs.{self.available_capital:,.0f} | Utilised: Rs.{utilisation:,.0f}")
             print(f"[P&L] Mark-to-market: Rs.{total_pnl:,.0f} ({total_pnl_pct:+.2f}%)")
 
-            if holdings_details:
+            if symbols:
                 print("[HOLDINGS] Open Positions (qty | entry -> current | P&L)")
-                for detail in holdings_details:
+                for symbol, qty, entry, current, sym_pnl, sym_pct in zip(
+                        symbols, qtys.tolist(), entries.tolist(), prices.tolist(), pnl.tolist(), pnl_pct.tolist()):
                     print(
-                        f"   {detail['symbol']:<12} | {int(detail['qty']):>4} | "
-                        f"Rs.{detail['entry']:>8.2f} → Rs.{detail['current']:>8.2f} | "
-                        f"Rs.{detail['pnl']:>8.0f} ({detail['pnl_pct']:+.2f}%)"
+                        f"   {symbol:<12} | {int(qty):>4} | "
+                        f"Rs.{entry:>8.2f} → Rs.{current:>8.2f} | "
+                        f"Rs.{sym_pnl:>8.0f} ({sym_pct:+.2f}%)"
                     )
             else:
                 print("[HOLDINGS] No open positions")
@@ -906,16 +1574,16 @@ class PerfectTraderPaperTrading:
         """Return path and contents of the freshest portfolio snapshot (main or backups)."""
         candidates: list[tuple[Path, dict, datetime, float]] = []
 
-        def _load_snapshot_file(path: Path):
+        def _load_snapshot_file(path: Path, mtime: float):
             try:
-                payload = json.loads(path.read_text(encoding='utf-8'))
+                payload = _json_loads(path.read_bytes())
             except Exception:
                 return
             last_dt_raw = payload.get('last_trading_date')
             last_dt = None
             if last_dt_raw:
                 try:
-                    last_dt = datetime.fromisoformat(last_dt_raw)
+                    last_dt = _parse_iso(last_dt_raw)
                 except Exception:
                     last_dt = None
             if isinstance(last_dt, datetime):
@@ -925,17 +1593,30 @@ class PerfectTraderPaperTrading:
                     last_dt = last_dt.replace(tzinfo=IST)
             else:
                 last_dt = datetime.min.replace(tzinfo=IST)
-            candidates.append((path, payload, last_dt, path.stat().st_mtime))
+            candidates.append((path, payload, last_dt, mtime))
 
         # Primary portfolio file
-        if self.portfolio_file.exists():
-            _load_snapshot_file(self.portfolio_file)
+        try:
+            _load_snapshot_file(self.portfolio_file, self.portfolio_file.stat().st_mtime)
+        except OSError:
+            pass
 
-        # Timestamped backups
-        backups_dir = Path('Reports Day Trading')
-        if backups_dir.exists():
-            for backup_path in backups_dir.glob('paper_trading_portfolio_*.json.bak'):
-                _load_snapshot_file(backup_path)
+        # A primary snapshot written today cannot be beaten by an older backup
+        if candidates and candidates[0][2].date() == datetime.now(IST).date():
+            return candidates[0][0], candidates[0][1]
+
+        # Timestamped backups: one stat per entry, and only the newest few are parsed
+        try:
+            with os.scandir(PORTFOLIO_BACKUP_DIR) as it:
+                backups = [
+                    (entry.stat().st_mtime, entry.path) for entry in it
+                    if entry.name.startswith('paper_trading_portfolio_') and entry.name.endswith('.json.bak')
+                ]
+        except OSError:
+            backups = []
+        backups.sort(reverse=True)
+        for mtime, backup_path in backups[:SNAPSHOT_BACKUPS_SCANNED]:
+            _load_snapshot_file(Path(backup_path), mtime)
 
         if not candidates:
             return None, None
@@ -950,14 +1631,16 @@ class PerfectTraderPaperTrading:
         self.capital = payload.get('capital', self.capital)
         self.available_capital = payload.get('available_capital', self.available_capital)
         self.positions = payload.get('positions', {}) or {}
-        self.trade_history = payload.get('trade_history', []) or []
+        self._pos_dirty = True
+        self.trade_history = self._load_trade_history(payload.get('trade_history'),
+                                                      payload.get('trade_history_bytes'))
         self.total_trades = payload.get('total_trades', 0)
         self.winning_trades = payload.get('winning_trades', 0)
 
         last_dt_raw = payload.get('last_trading_date')
         if last_dt_raw:
             try:
-                last_dt = datetime.fromisoformat(last_dt_raw)
+                last_dt = _parse_iso(last_dt_raw)
                 if last_dt.tzinfo:
                     last_dt = last_dt.astimezone(IST)
                 else:
@@ -980,13 +1663,106 @@ class PerfectTraderPaperTrading:
 
         print(f"[PORTFOLIO] {label}: Rs.{portfolio_value:,.0f} | Positions: {len(self.positions)}")
 
+    @staticmethod
+    def _trade_columns(history) -> dict:
+        """Columnar trade history from a snapshot; accepts the legacy list-of-dicts layout."""
+        if isinstance(history, dict):
+            return {col: list(history.get(col, [])) for col in _TRADE_COLUMNS}
+        history = history or []
+        return {col: [trade.get(col) for trade in history] for col in _TRADE_COLUMNS}
+
+    def _trade_log_length(self) -> int:
+        """Current size of the JSONL trade log in bytes (0 if it does not exist)."""
+        try:
+            return self.trade_history_file.stat().st_size
+        except OSError:
+            return 0
+
+    def _load_trade_history(self, embedded=None, snapshot_bytes: int | None = None) -> dict:
+        """Last TRADE_HISTORY_IN_MEMORY trades from the JSONL log, as columns.
+
+        Snapshots written before the JSONL log embedded the full history; if the log
+        does not exist yet, that history seeds it. Log entries past snapshot_bytes
+        were written after the snapshot (a restored backup, or a kill before the
+        save) and are moved aside so the log matches the restored positions.
+        Only a trading engine migrates or repairs the log; a dry run reads it as is.
+        """
+        log_file = self.trade_history_file
+        owner = not self.dry_run_configured
+        if embedded and not log_file.exists():
+            columns = self._trade_columns(embedded)
+            if owner:
+                rows = [dict(zip(_TRADE_COLUMNS, row)) for row in zip(*columns.values())]
+                try:
+                    log_file.write_bytes(b''.join(map(_json_line, rows)))
+                    print(f"[TRADES] Migrated {len(rows)} trades to {log_file}")
+                except Exception as exc:
+                    print(f"[TRADES] Unable to migrate trade history: {exc}")
+            self._trade_log_size = self._trade_log_length()
+            return {col: values[-TRADE_HISTORY_IN_MEMORY:] for col, values in columns.items()}
+
+        try:
+            with open(log_file, 'r+b' if owner else 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                if snapshot_bytes is not None and size > snapshot_bytes:
+                    if owner:
+                        f.seek(snapshot_bytes)
+                        tail = f.read()
+                        orphaned = log_file.with_name(f"{log_file.stem}.orphaned{log_file.suffix}")
+                        with open(orphaned, 'ab') as out:
+                            out.write(tail)
+                        f.truncate(snapshot_bytes)
+                        moved = tail.count(b'\n')
+                        print(f"[TRADES] {moved} trades newer than the snapshot moved to {orphaned}")
+                    else:
+                        print(f"[DRY-RUN] {log_file} runs past the snapshot; leaving it as is")
+                elif snapshot_bytes is not None and size < snapshot_bytes:
+                    print(f"[TRADES] {log_file} is shorter than the snapshot expects ({size} < {snapshot_bytes} bytes)")
+                f.seek(0)
+                recent = deque(f, maxlen=TRADE_HISTORY_IN_MEMORY)
+                self._trade_log_size = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            recent = ()
+            self._trade_log_size = 0
+        return self._trade_columns(reporting.parse_trade_log(recent))
+
+    def _archive_trade_history(self):
+        """Rename the trade log aside so a fresh portfolio starts with an empty one."""
+        log_file = self.trade_history_file
+        archived = log_file.with_name(f"{log_file.stem}.{datetime.now(IST).strftime('%Y%m%d_%H%M%S')}{log_file.suffix}")
+        try:
+            log_file.rename(archived)
+            print(f"[TRADES] Archived previous trade log to {archived}")
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            print(f"[TRADES] Unable to archive {log_file}: {exc}")
+            return
+        self._trade_log_size = 0
+
+    def _record_trade(self, trade: dict):
+        """Append a closed trade to the JSONL log and the bounded in-memory columns."""
+        try:
+            with open(self.trade_history_file, 'ab') as f:
+                f.write(_json_line(trade))
+                self._trade_log_size = f.tell()
+        except Exception as exc:
+            print(f"[TRADES] Unable to append to {self.trade_history_file}: {exc}")
+        for col, values in self.trade_history.items():
+            values.append(trade.get(col))
+            if len(values) > TRADE_HISTORY_IN_MEMORY:
+                del values[0]
+
     def _load_portfolio_state(self):
         """Load portfolio state from persistence files"""
-        today = datetime.now(IST).date()
+        # (st_mtime_ns, payload) of the main portfolio file as restored, reused by the opening summary
+        self._opening_snapshot = None
         
         # Force fresh start if requested
         if self.force_fresh_start:
             print(f"[FRESH START] Ignoring existing portfolio data")
+            if not self.dry_run_configured:
+                self._archive_trade_history()
             return
         
         snapshot_path, snapshot_payload = self._find_latest_portfolio_snapshot()
@@ -1001,66 +1777,117 @@ class PerfectTraderPaperTrading:
             # Ensure main portfolio file mirrors the restored snapshot for continuity
             if snapshot_path != self.portfolio_file:
                 try:
-                    self.portfolio_file.write_text(json.dumps(snapshot_payload, indent=2), encoding='utf-8')
+                    reporting.atomic_write(self.portfolio_file, _json_dumps(snapshot_payload), durable=True)
                     print(f"[PORTFOLIO] Synced main snapshot from {snapshot_path.name}")
                 except Exception as exc:
                     print(f"[PORTFOLIO] Warning: could not sync main snapshot: {exc}")
+            try:
+                self._opening_snapshot = (os.stat(self.portfolio_file).st_mtime_ns, snapshot_payload)
+            except OSError:
+                pass
         except Exception as e:
             print(f"[WARNING] Error loading portfolio state: {e}")
             print("[RESET] Starting fresh with default capital")
     
-    def _save_portfolio_state(self, is_end_of_day=False):
-        """Save current portfolio state for persistence"""
+    def _flush_portfolio_state(self):
+        """Write the snapshot if trades happened since the last save (end of scan, exit hook)."""
+        if self._portfolio_dirty:
+            self._save_portfolio_state(is_end_of_day=False)
+
+    def _prune_portfolio_backups(self):
+        """Delete portfolio backups older than the retention window, always keeping the newest few."""
+        cutoff = time.time() - PORTFOLIO_BACKUP_RETENTION_DAYS * 86400
+        try:
+            with os.scandir(PORTFOLIO_BACKUP_DIR) as it:
+                backups = sorted(
+                    ((entry.stat().st_mtime, entry.path) for entry in it
+                     if entry.name.startswith('paper_trading_portfolio_') and entry.name.endswith('.json.bak')),
+                    reverse=True,
+                )
+        except OSError:
+            return
+        removed = 0
+        for mtime, path in backups[SNAPSHOT_BACKUPS_SCANNED:]:
+            if mtime < cutoff:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"[PORTFOLIO] Removed {removed} backups older than {PORTFOLIO_BACKUP_RETENTION_DAYS} days")
+
+    def _save_portfolio_state(self, is_end_of_day=False, total_value: float | None = None):
+        """Save current portfolio state for persistence (total_value: valuation already computed, if any)"""
         try:
             # In dry-run mode, avoid overwriting a real portfolio with an empty snapshot
             if getattr(self, 'dry_run_configured', False):
                 if not self.positions and self.available_capital == self.initial_capital:
-                    print("[DRY-RUN] Skipping portfolio save (no positions, full cash)")
+                    self._log("[DRY-RUN] Skipping portfolio save (no positions, full cash)")
                     return
 
             # Calculate total portfolio value
-            total_value = self.available_capital
-            for symbol, position in self.positions.items():
-                current_price = self.get_current_price(symbol)
-                if current_price > 0:
-                    total_value += position['shares'] * current_price
+            if total_value is None:
+                total_value = self._portfolio_value(self.get_current_prices(list(self.positions)))
             
             state = {
-                'last_trading_date': datetime.now(IST).isoformat(),
-                'session_end_time': datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S'),
                 'initial_capital': self.initial_capital,
                 'capital': self.capital,
                 'available_capital': self.available_capital,
                 'positions': self.positions,
-                'trade_history': self.trade_history,
+                # Relative to the portfolio file's directory (the dashboards resolve it there)
+                'trade_history_file': self.trade_history_file.name,
+                'trade_history_bytes': self._trade_log_size,
                 'total_trades': self.total_trades,
                 'winning_trades': self.winning_trades,
                 'total_portfolio_value': total_value,
                 'end_of_day_balance': total_value if is_end_of_day else self.available_capital
             }
-            
-            # Backup current file (if exists) with timestamp for recovery
+
+            # Skip the write (and backup) when nothing but the time of day would change; the
+            # trading date is hashed so a new day always rewrites last_trading_date
+            now = datetime.now(IST)
+            state_hash = hashlib.blake2b(_json_dumps(state) + now.date().isoformat().encode()).digest()
+            if state_hash == self._last_saved_hash and not is_end_of_day:
+                self._portfolio_dirty = False
+                return
+
+            state = {
+                'last_trading_date': now.isoformat(),
+                'session_end_time': now.strftime('%Y-%m-%d %H:%M:%S'),
+                **state,
+            }
+            payload = _json_dumps(state)
+
+            # Backup current file (if exists) with timestamp for recovery: at most once per
+            # interval, and never twice for the same content. A file this session has not
+            # written yet (_last_saved_hash is None) is always worth one backup.
             try:
-                if self.portfolio_file.exists():
-                    ts = datetime.now(IST).strftime('%Y%m%d_%H%M%S')
-                    # Save backup files to Reports Day Trading folder
-                    reports_dir = Path('Reports Day Trading')
-                    reports_dir.mkdir(exist_ok=True)  # Ensure directory exists
-                    backup = reports_dir / f"paper_trading_portfolio_{ts}.json.bak"
-                    backup.write_text(self.portfolio_file.read_text(encoding='utf-8'), encoding='utf-8')
+                due = (self._last_backup_at is None
+                       or time.monotonic() - self._last_backup_at >= PORTFOLIO_BACKUP_INTERVAL_SECS)
+                changed = self._last_saved_hash is None or self._last_saved_hash != self._last_backup_hash
+                if self.portfolio_file.exists() and (due or is_end_of_day) and changed:
+                    ts = now.strftime('%Y%m%d_%H%M%S')
+                    PORTFOLIO_BACKUP_DIR.mkdir(exist_ok=True)  # Ensure directory exists
+                    backup = PORTFOLIO_BACKUP_DIR / f"paper_trading_portfolio_{ts}.json.bak"
+                    shutil.copy2(self.portfolio_file, backup)
+                    self._last_backup_at = time.monotonic()
+                    self._last_backup_hash = self._last_saved_hash
             except Exception:
                 pass
 
-            with open(self.portfolio_file, 'w') as f:
-                json.dump(state, f, indent=2, default=str)
+            # fsync: a kill or power loss must never leave a truncated portfolio behind
+            reporting.atomic_write(self.portfolio_file, payload, durable=True)
+            self._last_saved_hash = state_hash
+            self._portfolio_dirty = False
             
             if is_end_of_day:
-                print(f"[SAVE] End-of-day portfolio: Rs.{total_value:,.0f}")
+                self._log(f"[SAVE] End-of-day portfolio: Rs.{total_value:,.0f}")
             else:
-                print(f"[SAVE] Portfolio state: Rs.{total_value:,.0f} total value")
+                self._log(f"[SAVE] Portfolio state: Rs.{total_value:,.0f} total value")
                 
         except Exception as e:
-            print(f"[ERROR] Saving portfolio state: {e}")
+            self._log(f"[ERROR] Saving portfolio state: {e}")
         
     def _load_strategy(self):
         """Load MTFA strategy with fallback"""
@@ -1071,25 +1898,95 @@ class PerfectTraderPaperTrading:
             # Override data loading to use cached data only
             def cached_load(symbol):
                 data = {}
-                cache_dir = Path('data_cache') / symbol
-                for timeframe in ['daily', '60min', '15min']:
-                    cache_file = cache_dir / f"{timeframe}.csv"
-                    if cache_file.exists():
-                        try:
-                            df = pd.read_csv(cache_file, index_col='datetime', parse_dates=True)
-                            if not df.empty:
-                                data[timeframe] = df
-                        except:
-                            pass
+                for timeframe, cache_file in self._cache_paths_for(symbol).items():
+                    # _cached_candles stats the file itself; a missing one just raises
+                    try:
+                        df = _cached_candles(cache_file)
+                        if not df.empty:
+                            data[timeframe] = df
+                    except:
+                        pass
                 return data
             
+            # Missing-data recovery downloads from Kite; signal workers only queue it so the
+            # pool stays pure computation, and _signals_for runs it one symbol at a time
+            recover = strategy._recover_symbol_data
+
+            def deferred_recover(symbol, missing):
+                if not getattr(self._thread_role, 'signal_worker', False):
+                    return recover(symbol, missing)
+                with self._recovery_lock:
+                    self._pending_recovery[symbol] = missing
+                return False
+
             strategy._load_mtf_data = cached_load
+            strategy._recover_symbol_data = deferred_recover
             return strategy
         except:
             return None
     
+    def _signals_for(self, symbols: list[str]) -> dict:
+        """get_signal for many symbols on SIGNAL_WORKERS threads.
+
+        A symbol that raises, or is still running after SIGNAL_TIMEOUT_SECS, scores as
+        HOLD for this scan instead of failing or stalling the whole scan.
+        """
+        hold = {'signal': 'HOLD', 'score': 50, 'entry_price': 0}
+        signals = dict.fromkeys(symbols, hold)
+        # One pool per engine: stuck workers occupy a fixed set of threads instead of
+        # leaking a fresh pool's worth every scan
+        if self._signal_pool is None:
+            self._signal_pool = ThreadPoolExecutor(
+                max_workers=SIGNAL_WORKERS, thread_name_prefix='signal',
+                initializer=setattr, initargs=(self._thread_role, 'signal_worker', True),
+            )
+        # A symbol still computing from an earlier scan is not queued again
+        self._signal_running = {s: f for s, f in self._signal_running.items() if not f.done()}
+        if self._signal_running:
+            self._log(f"[SIGNAL] {len(self._signal_running)} symbols still running from an earlier scan - HOLD")
+        futures = {self._signal_pool.submit(self.get_signal, symbol): symbol
+                   for symbol in symbols if symbol not in self._signal_running}
+        try:
+            for future in as_completed(futures, timeout=SIGNAL_TIMEOUT_SECS):
+                try:
+                    signals[futures[future]] = future.result()
+                except Exception as exc:
+                    self._log(f"[SIGNAL] {futures[future]}: {exc}")
+        except FuturesTimeout:
+            # Drop work that never started; remember what is still running
+            pending = [f for f in futures if not f.cancel() and not f.done()]
+            self._signal_running.update((futures[f], f) for f in pending)
+            self._log(f"[SIGNAL] {len(pending)} symbols still running after {SIGNAL_TIMEOUT_SECS}s - HOLD this scan")
+
+        # Serial recovery on the scan thread for symbols whose workers found data missing
+        with self._recovery_lock:
+            recovery, self._pending_recovery = self._pending_recovery, {}
+        for symbol in recovery:
+            if symbol not in signals:
+                continue
+            self._signal_cache.pop(symbol, None)
+            self.strategy._insufficient_logged.discard(symbol)  # let analyze() retry it
+            try:
+                signals[symbol] = self.get_signal(symbol)
+            except Exception as exc:
+                self._log(f"[SIGNAL] {symbol}: {exc}")
+        return signals
+
     def get_signal(self, symbol: str):
-        """Get trading signal"""
+        """Get trading signal (memoised until one of the symbol's candle files changes)"""
+        key = tuple(_mtime_ns(path) for path in self._cache_paths_for(symbol).values())
+        cached = self._signal_cache.get(symbol)
+        if cached is not None and cached[0] == key:
+            # Callers get their own dict, stamped with when it was served
+            result = dict(cached[1])
+            if 'timestamp' in result:
+                result['timestamp'] = datetime.now(IST)
+            return result
+        result = self._compute_signal(symbol)
+        self._signal_cache[symbol] = (key, dict(result))
+        return result
+
+    def _compute_signal(self, symbol: str):
         if self.strategy:
             try:
                 return self.strategy.analyze(symbol)
@@ -1098,17 +1995,17 @@ class PerfectTraderPaperTrading:
         
         # Simple fallback signal
         try:
-            cache_file = Path('data_cache') / symbol / '15min.csv'
+            cache_file = self._cache_paths_for(symbol)['15min']
             if not cache_file.exists():
                 return {'signal': 'HOLD', 'score': 50, 'entry_price': 0}
             
-            data = pd.read_csv(cache_file, index_col='datetime', parse_dates=True)
-            if len(data) < 50:
+            closes = _cached_closes(cache_file)
+            if closes.size < 50:
                 return {'signal': 'HOLD', 'score': 50, 'entry_price': 0}
             
-            current_price = data['close'].iloc[-1]
-            sma_20 = data['close'].rolling(20).mean().iloc[-1]
-            sma_50 = data['close'].rolling(50).mean().iloc[-1]
+            current_price = float(closes[-1])
+            sma_20 = closes[-20:].mean()
+            sma_50 = closes[-50:].mean()
             
             # Generate simple signal
             if current_price > sma_20 > sma_50:
@@ -1142,36 +2039,24 @@ class PerfectTraderPaperTrading:
         try:
             if market_open and self.use_live_data and self.live_api:
                 # Zerodha API path
-                cache_key = symbol
-                now = datetime.now()
-                if (
-                    cache_key in self.price_cache and
-                    cache_key in self.last_cache_update and
-                    (now - self.last_cache_update[cache_key]).seconds < 30
-                ):
-                    price = float(self.price_cache[cache_key])
+                now = time.monotonic()
+                cached = self.price_cache.get(symbol)
+                if cached and now - cached[1] < PRICE_CACHE_TTL_SECS:
+                    price = cached[0]
                     print(f"[CACHE] {symbol}: Rs.{price:.2f} (30s cache)")
                 else:
                     # Get fresh live price - CRITICAL for accuracy
                     live_price = self.live_api.get_live_price(symbol)
                     if live_price > 0:
                         price = float(live_price)
-                        self.price_cache[cache_key] = price
-                        self.last_cache_update[cache_key] = now
+                        self.price_cache[symbol] = (price, now)
         except Exception:
             # ignore and fallback
             price = 0.0
 
         # Fallback: use latest cached 15min close if live not available
         if price <= 0:
-            try:
-                cache_file = Path('data_cache') / symbol / '15min.csv'
-                if cache_file.exists():
-                    data = pd.read_csv(cache_file, index_col='datetime', parse_dates=True)
-                    if not data.empty and 'close' in data.columns:
-                        price = float(data['close'].iloc[-1])
-            except Exception:
-                pass
+            price = self._last_cached_close(symbol)
 
         # If still not available, return 0
         if price <= 0:
@@ -1182,44 +2067,118 @@ class PerfectTraderPaperTrading:
             return self._apply_trading_friction(price, symbol)
         return round(price, 2)
     
+    def _last_cached_close(self, symbol: str) -> float:
+        """Latest 15min close from the local data cache, or 0.0."""
+        try:
+            cache_file = self._cache_paths_for(symbol)['15min']
+            if cache_file.exists():
+                closes = _cached_closes(cache_file)
+                if closes.size:
+                    return float(closes[-1])
+        except Exception:
+            pass
+        return 0.0
+
+    def get_current_prices(self, symbols) -> dict:
+        """Batched get_current_price: one live LTP request covers every symbol not in the 30s cache"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        prices = {}
+        market_open = self.live_api.is_market_open() if self.live_api else self._is_market_open_basic()
+        try:
+            if market_open and self.use_live_data and self.live_api:
+                now = time.monotonic()
+                stale = []
+                for symbol in symbols:
+                    cached = self.price_cache.get(symbol)
+                    if cached and now - cached[1] < PRICE_CACHE_TTL_SECS:
+                        prices[symbol] = cached[0]
+                    else:
+                        stale.append(symbol)
+                if stale:
+                    for symbol, live_price in self.live_api.get_live_prices(stale).items():
+                        if live_price > 0:
+                            prices[symbol] = float(live_price)
+                            self.price_cache[symbol] = (prices[symbol], now)
+        except Exception as exc:
+            # Batch failed: whatever is already in hand is kept and the rest comes from the
+            # local candle cache below, rather than one live request per symbol
+            print(f"[PRICE] Batched live quote failed ({exc}) - using cached closes")
+
+        for symbol in symbols:
+            price = prices.get(symbol, 0.0)
+            if price <= 0:
+                price = self._last_cached_close(symbol)
+            prices[symbol] = round(price, 2) if price > 0 else 0
+        return prices
+
+    def _rand(self) -> float:
+        """Next uniform [0, 1) draw from the pre-generated buffer."""
+        if self._rand_idx >= RAND_BUFFER_SIZE:
+            self._rand_buf = self._rng.random(RAND_BUFFER_SIZE)
+            self._rand_idx = 0
+        value = self._rand_buf[self._rand_idx]
+        self._rand_idx += 1
+        return float(value)
+
     def _apply_trading_friction(self, price: float, symbol: str) -> float:
         """Apply realistic slippage and bid-ask spread"""
         # Base slippage (0.05%)
         base_slippage = 0.0005
         
         # Variable slippage based on volatility and liquidity
-        # Large cap: lower slippage, Small cap: higher slippage
-        if symbol in ['RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK']:
-            volatility_factor = 1.0  # Large cap
-        elif len([s for s in self.watchlist if s == symbol]) < 50:
-            volatility_factor = 1.5  # Mid cap
-        else:
-            volatility_factor = 2.0  # Small cap
+        volatility_factor = self._volatility_factor(symbol)
         
         # Random slippage component (market impact)
-        random_slippage = random.uniform(0, base_slippage * volatility_factor)
+        random_slippage = self._rand() * base_slippage * volatility_factor
         
         # Bid-ask spread simulation (0.01-0.05%)
-        spread = random.uniform(0.0001, 0.0005) * volatility_factor
+        spread = (0.0001 + self._rand() * 0.0004) * volatility_factor
         
         # Apply friction (always increases cost)
         total_friction = random_slippage + spread
         adjusted_price = price * (1 + total_friction)
         
         return round(adjusted_price, 2)
+
+    def _volatility_factor(self, symbol: str) -> float:
+        """Large cap: lower slippage, Small cap: higher slippage"""
+        if symbol in self._large_caps:
+            return 1.0  # Large cap
+        if symbol in self._small_caps:
+            return 2.0  # Small cap
+        return 1.5  # Mid cap / unknown
+
+    def _apply_trading_friction_arr(self, prices: np.ndarray, symbols) -> np.ndarray:
+        """Vectorised _apply_trading_friction: one draw of 2*N uniforms for N prices."""
+        factors = np.fromiter((self._volatility_factor(s) for s in symbols), dtype=np.float64, count=len(prices))
+        slip_draw, spread_draw = self._rng.random((2, len(prices)))
+        total_friction = (slip_draw * 0.0005 + 0.0001 + spread_draw * 0.0004) * factors
+        return np.round(prices * (1 + total_friction), 2)
     
     def _is_market_open_basic(self) -> bool:
         """Basic market hours check without API"""
-        now = datetime.now(IST)
-        market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-        market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-        is_weekday = now.weekday() < 5
-        return is_weekday and market_open <= now <= market_close
+        return self._is_market_open()
     
-    def execute_buy(self, symbol: str, signal_result: dict):
-        """Execute virtual buy order"""
+    def _size_buy_candidates(self, candidates):
+        """Slippage-adjusted entry prices and shares per rupee of risk for BUY candidates."""
+        # One batched LTP call prices every candidate; friction is drawn for all of them at once
+        symbols = [s for s, _, _ in candidates]
+        prices = self.get_current_prices(symbols)
+        entry_arr = self._apply_trading_friction_arr(
+            np.fromiter((prices.get(s, 0) for s in symbols), dtype=np.float64, count=len(symbols)), symbols)
+        stop_arr = np.array([r.get('stop_loss', e * 0.98) for (_, r, _), e in zip(candidates, entry_arr)],
+                            dtype=np.float64)
+        risk_arr = entry_arr - stop_arr
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_rupee = np.where(risk_arr > 0, 1.0 / risk_arr, 0.0)
+        return entry_arr, per_rupee
+
+    def execute_buy(self, symbol: str, signal_result: dict, entry_price: float = None, shares: int = None):
+        """Execute virtual buy order (entry_price/shares may be pre-sized by the scan)"""
         if not self.enable_trading:
-            print(f"[DRY-RUN] BUY skipped for {symbol}")
+            self._log(f"[DRY-RUN] BUY skipped for {symbol}")
             return False
         if len(self.positions) >= self.max_positions:
             return False
@@ -1229,14 +2188,16 @@ class PerfectTraderPaperTrading:
             return False
             
         # Get realistic entry price with slippage
-        entry_price = self.get_current_price(symbol, add_slippage=True)
+        if entry_price is None:
+            entry_price = self.get_current_price(symbol, add_slippage=True)
         stop_loss = signal_result.get('stop_loss', entry_price * 0.98)
         target = signal_result.get('target', entry_price * 1.03)
         
         # Position sizing - Use available capital, not total capital
-        risk_amount = self.available_capital * self.risk_per_trade
-        risk_per_share = entry_price - stop_loss
-        shares = int(risk_amount / risk_per_share) if risk_per_share > 0 else 0
+        if shares is None:
+            risk_amount = self.available_capital * self.risk_per_trade
+            risk_per_share = entry_price - stop_loss
+            shares = int(risk_amount / risk_per_share) if risk_per_share > 0 else 0
         
         # Check capital
         cost = shares * entry_price * (1 + self.transaction_cost)
@@ -1250,10 +2211,13 @@ class PerfectTraderPaperTrading:
         activation_percent = trailing_config.get('trailing_stop_activation_percent', 1.5)
         
         # Create position with trailing stop data
+        entry_dt = datetime.now(IST)
         self.positions[symbol] = {
-            'entry_time': datetime.now(IST).isoformat(),
+            'entry_time': entry_dt.isoformat(),
+            'entry_ts': entry_dt.timestamp(),
             'entry_price': entry_price,
             'shares': shares,
+            'cost_basis': cost,  # cash paid incl. transaction cost; reused by execute_sell
             'stop_loss': stop_loss,
             'original_stop_loss': stop_loss,
             'target': target,
@@ -1264,60 +2228,64 @@ class PerfectTraderPaperTrading:
             'highest_price': entry_price,  # Track highest price for trailing
             'trailing_activated': False
         }
+        self._pos_dirty = True
         
         self.available_capital -= cost
         self.total_trades += 1
         
-        print(f"[BUY] {symbol} - {shares} shares @ Rs.{entry_price:.2f}")
-        print(f"   Stop: Rs.{stop_loss:.2f}, Target: Rs.{target:.2f}")
-        # Persist immediately to treat account as original
-        try:
-            self._save_portfolio_state(is_end_of_day=False)
-        except Exception:
-            pass
+        self._log(f"[BUY] {symbol} - {shares} shares @ Rs.{entry_price:.2f}")
+        self._log(f"   Stop: Rs.{stop_loss:.2f}, Target: Rs.{target:.2f}")
+        # Snapshot is written once when the scan ends (scan_and_trade), not per fill
+        self._portfolio_dirty = True
         
         return True
     
-    def update_trailing_stops(self):
+    def update_trailing_stops(self, prices: dict | None = None):
         """Update trailing stop losses for all positions"""
-        for symbol, position in self.positions.items():
-            if not position.get('trailing_stop_enabled', False):
-                continue
-                
-            current_price = self.get_current_price(symbol)
-            if current_price <= 0:
-                continue
-                
-            entry_price = position['entry_price']
-            highest_price = position.get('highest_price', entry_price)
-            activation_percent = position.get('activation_percent', 0.015)
-            trailing_percent = position.get('trailing_stop_percent', 0.02)
-            
-            # Update highest price
-            if current_price > highest_price:
-                position['highest_price'] = current_price
-                highest_price = current_price
-            
-            # Check if trailing should be activated
-            profit_percent = (current_price - entry_price) / entry_price
-            if not position.get('trailing_activated', False) and profit_percent >= activation_percent:
-                position['trailing_activated'] = True
-                print(f"[TRAIL] ACTIVATED for {symbol} at {profit_percent*100:.1f}% profit")
-            
-            # Update trailing stop if activated
-            if position.get('trailing_activated', False):
-                new_stop = highest_price * (1 - trailing_percent)
-                current_stop = position['stop_loss']
-                
-                # Only move stop up (for long positions)
-                if new_stop > current_stop:
-                    position['stop_loss'] = new_stop
-                    print(f"[TRAIL] STOP updated for {symbol}: Rs.{current_stop:.2f} -> Rs.{new_stop:.2f}")
+        if prices is None:
+            prices = self.get_current_prices(
+                [s for s, p in self.positions.items() if p.get('trailing_stop_enabled', False)])
+        symbols = [s for s, p in self.positions.items()
+                   if p.get('trailing_stop_enabled', False) and prices.get(s, 0) > 0]
+        if not symbols:
+            return
+        rows = [self.positions[s] for s in symbols]
+
+        # Gather into aligned arrays, update them in a few vector ops, write back only changes
+        price = np.array([prices[s] for s in symbols], dtype=np.float64)
+        entry = np.array([p['entry_price'] for p in rows], dtype=np.float64)
+        highest = np.array([p.get('highest_price', p['entry_price']) for p in rows], dtype=np.float64)
+        act_pct = np.array([p.get('activation_percent', 0.015) for p in rows], dtype=np.float64)
+        trail_pct = np.array([p.get('trailing_stop_percent', 0.02) for p in rows], dtype=np.float64)
+        stop = np.array([p['stop_loss'] for p in rows], dtype=np.float64)
+        activated = np.array([p.get('trailing_activated', False) for p in rows], dtype=bool)
+
+        new_highest = np.maximum(highest, price)
+        profit_pct = (price - entry) / entry
+        newly_activated = ~activated & (profit_pct >= act_pct)
+        trail_stop = new_highest * (1 - trail_pct)
+        # Only move stop up (for long positions)
+        raised = (activated | newly_activated) & (trail_stop > stop)
+        moved_high = new_highest > highest
+
+        # Ratcheted stops must survive a restart, so any change marks the snapshot for saving
+        if moved_high.any() or newly_activated.any() or raised.any():
+            self._portfolio_dirty = True
+        for i in np.flatnonzero(moved_high):
+            rows[i]['highest_price'] = float(new_highest[i])
+        for i in np.flatnonzero(newly_activated):
+            rows[i]['trailing_activated'] = True
+            self._log(f"[TRAIL] ACTIVATED for {symbols[i]} at {profit_pct[i]*100:.1f}% profit")
+        if raised.any():
+            self._pos_dirty = True
+        for i in np.flatnonzero(raised):
+            rows[i]['stop_loss'] = float(trail_stop[i])
+            self._log(f"[TRAIL] STOP updated for {symbols[i]}: Rs.{stop[i]:.2f} -> Rs.{trail_stop[i]:.2f}")
     
     def execute_sell(self, symbol: str, price: float, reason: str):
         """Execute virtual sell order"""
         if not self.enable_trading:
-            print(f"[DRY-RUN] SELL skipped for {symbol} [{reason}]")
+            self._log(f"[DRY-RUN] SELL skipped for {symbol} [{reason}]")
             return False
         if symbol not in self.positions:
             return False
@@ -1327,7 +2295,10 @@ class PerfectTraderPaperTrading:
         
         # Calculate P&L
         proceeds = position['shares'] * exit_price * (1 - self.transaction_cost)
-        cost = position['shares'] * position['entry_price'] * (1 + self.transaction_cost)
+        cost = position.get('cost_basis')
+        if cost is None:
+            # Positions opened before cost_basis was recorded
+            cost = position['cost_basis'] = position['shares'] * position['entry_price'] * (1 + self.transaction_cost)
         pnl = proceeds - cost
         pnl_pct = (pnl / cost) * 100
         
@@ -1339,30 +2310,84 @@ class PerfectTraderPaperTrading:
         else:
             status = "[-] LOSS"
             
-        print(f"{status}: {symbol} @ Rs.{exit_price:.2f} - P&L: Rs.{pnl:,.0f} ({pnl_pct:+.2f}%) [{reason}]")
+        self._log(f"{status}: {symbol} @ Rs.{exit_price:.2f} - P&L: Rs.{pnl:,.0f} ({pnl_pct:+.2f}%) [{reason}]")
         
         # Record trade
-        self.trade_history.append({
+        self._record_trade({
+            'timestamp': datetime.now(IST).isoformat(),
             'symbol': symbol,
             'pnl': pnl,
             'pnl_pct': pnl_pct,
-            'reason': reason
+            'reason': reason,
         })
         
         del self.positions[symbol]
-        # Persist immediately to treat account as original
-        try:
-            self._save_portfolio_state(is_end_of_day=False)
-        except Exception:
-            pass
+        self._pos_dirty = True
+        # The trade is already in the JSONL log; the snapshot follows when the scan ends
+        self._portfolio_dirty = True
         return True
     
-    def scan_and_trade(self):
+    def _ensure_pos_arrays(self):
+        """Rebuild the column-wise view of self.positions if it changed since the last call.
+
+        self.positions stays the source of truth (execute_buy/sell, snapshots); anything
+        that mutates it sets _pos_dirty.
+        """
+        if not self._pos_dirty:
+            return
+        rows = list(self.positions.values())
+        self._pos_symbols = list(self.positions)
+        self._pos_index = {symbol: i for i, symbol in enumerate(self._pos_symbols)}
+        self._pos_shares = np.array([p['shares'] for p in rows], dtype=np.float64)
+        self._pos_entry = np.array([p['entry_price'] for p in rows], dtype=np.float64)
+        self._pos_stop = np.array([p['stop_loss'] for p in rows], dtype=np.float64)
+        self._pos_target = np.array([p['target'] for p in rows], dtype=np.float64)
+        self._pos_trail_enabled = np.array([p.get('trailing_stop_enabled', False) for p in rows], dtype=bool)
+        self._pos_dirty = False
+
+    def _position_prices(self, prices: dict) -> np.ndarray:
+        """Prices aligned with _pos_symbols (0 where unknown)."""
+        self._ensure_pos_arrays()
+        return np.array([prices.get(s, 0) for s in self._pos_symbols], dtype=np.float64)
+
+    def _portfolio_value(self, prices: dict) -> float:
+        """Cash plus mark-to-market of positions that have a price."""
+        px = self._position_prices(prices)
+        return float(self.available_capital + np.dot(self._pos_shares, np.where(px > 0, px, 0.0)))
+
+    def _can_open_position(self) -> bool:
+        """True when there is both cash and a free slot for a new entry."""
+        return (self.available_capital > self.min_trade_size
+                and len(self.positions) < self.max_positions)
+
+    def _log(self, msg: str):
+        """Print now, or buffer into the current scan's log (written once by scan_and_trade)"""
+        if self._scan_log is None:
+            print(msg)
+        else:
+            self._scan_log.append(msg)
+
+    def scan_and_trade(self, now: datetime | None = None):
         """Scan market and execute trades"""
-        scan_start = datetime.now(IST)
-        print(f"\n[SCAN] MARKET SCAN - {scan_start.strftime('%H:%M:%S')}")
-        print(f"   Strategy: {'MTFA' if self.strategy else 'Simple SMA'}")
-        print("-" * 50)
+        # All scan output (rows, SELL/BUY/TRAIL lines) goes out in one write; verbose prints live
+        self._scan_log = None if self.verbose else []
+        try:
+            self._scan(now)
+        finally:
+            # Fills are on disk before anything later in the loop (status, reporting) can fail;
+            # the [SAVE] line goes through _log, so it follows this scan's rows
+            self._flush_portfolio_state()
+            lines, self._scan_log = self._scan_log, None
+            if lines:
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
+
+    def _scan(self, now: datetime | None = None):
+        """Body of scan_and_trade; output goes through self._log"""
+        scan_start = now or datetime.now(IST)
+        self._log(f"\n[SCAN] MARKET SCAN - {scan_start.strftime('%H:%M:%S')}")
+        self._log(f"   Strategy: {'MTFA' if self.strategy else 'Simple SMA'}")
+        self._log('-' * 50)
         
         signals_found = 0
         buy_opportunities = []
@@ -1370,36 +2395,44 @@ class PerfectTraderPaperTrading:
         price_fallbacks = []
         errors = []
         
+        # One batched price fetch for every held symbol, shared by trailing stops and exits
+        held_prices = self.get_current_prices(list(self.positions)) if self.positions else {}
+
         # Update trailing stops for existing positions first
+        exit_codes = {}
         if self.positions:
-            self.update_trailing_stops()
+            self.update_trailing_stops(held_prices)
+
+            # STOP/TARGET decisions for every held symbol in one kernel pass (after trailing updates)
+            codes = exit_kernel.eval_exits(self._position_prices(held_prices), self._pos_stop, self._pos_target)
+            exit_codes = dict(zip(self._pos_symbols, codes.tolist()))
         
         # Scan all 105 stocks in watchlist
         scan_list = self.watchlist
+
+        # Signals for entry candidates are computed concurrently up front; trading
+        # decisions below stay serial since they mutate positions and capital
+        signals = {}
+        candidates = [s for s in scan_list if s not in self.positions]
+        if candidates and self._can_open_position():
+            signals = self._signals_for(candidates)
         
-        for i, symbol in enumerate(scan_list, 1):
+        emit = self._log
+
+        for symbol, row in zip(scan_list, self._scan_labels):
             try:
-                # Show which category we're scanning
-                if i <= 35:
-                    category = "L"  # Large cap (first 35)
-                elif i <= 70:
-                    category = "M"  # Mid cap (next 35)
-                else:
-                    category = "S"  # Small cap (last 35)
-                    
-                print(f"[{i:3}/{len(scan_list)}] {symbol:<12} {category}", end=" ")
-                
                 # Check existing position
                 if symbol in self.positions:
                     position = self.positions[symbol]
-                    current_price = self.get_current_price(symbol)
+                    current_price = held_prices.get(symbol, 0)
                     
                     if current_price <= 0:
-                        print("NO DATA")
+                        emit(f"{row} NO DATA")
                         continue
                     
                     # Check stop/target
-                    if current_price <= position['stop_loss']:
+                    exit_code = exit_codes.get(symbol, exit_kernel.HOLD)
+                    if exit_code == exit_kernel.STOP:
                         if self.execute_sell(symbol, current_price, 'STOP'):
                             actions_log.append({
                                 'type': 'SELL', 'symbol': symbol, 'qty': position['shares'],
@@ -1407,8 +2440,8 @@ class PerfectTraderPaperTrading:
                                 'reason': 'STOP', 'sl': position['stop_loss'], 'tp': position['target']
                             })
                         signals_found += 1
-                        print("STOP LOSS")
-                    elif current_price >= position['target']:
+                        emit(f"{row} STOP LOSS")
+                    elif exit_code == exit_kernel.TARGET:
                         if self.execute_sell(symbol, current_price, 'TARGET'):
                             actions_log.append({
                                 'type': 'SELL', 'symbol': symbol, 'qty': position['shares'],
@@ -1416,31 +2449,43 @@ class PerfectTraderPaperTrading:
                                 'reason': 'TARGET', 'sl': position['stop_loss'], 'tp': position['target']
                             })
                         signals_found += 1
-                        print("TARGET HIT")
+                        emit(f"{row} TARGET HIT")
                     else:
                         pnl_pct = (current_price - position['entry_price']) / position['entry_price'] * 100
-                        print(f"HOLD [{pnl_pct:+.1f}%]")
+                        emit(f"{row} HOLD [{pnl_pct:+.1f}%]")
                 else:
-                    # Get new signal
-                    signal_result = self.get_signal(symbol)
+                    # No BUY could execute this cycle; skip the signal fetch
+                    # (re-checked per symbol since a SELL above frees capital)
+                    if not self._can_open_position():
+                        emit(f"{row} SKIP (no capacity)")
+                        continue
+
+                    # Get new signal (computed above unless capacity was freed by a SELL)
+                    signal_result = signals.get(symbol) or self.get_signal(symbol)
                     signal = signal_result.get('signal', 'HOLD')
                     score = signal_result.get('score', 50)
                     
                     if signal == 'BUY':
                         buy_opportunities.append((symbol, signal_result, score))
-                        print(f"BUY ({score:.0f})")
+                        emit(f"{row} BUY ({score:.0f})")
                     elif signal == 'SELL':
-                        print(f"SELL ({score:.0f})")
+                        emit(f"{row} SELL ({score:.0f})")
                     else:
-                        print("HOLD")
+                        emit(f"{row} HOLD")
                         
             except Exception as e:
-                print("ERROR")
+                emit(f"{row} ERROR")
         
         # Execute best buy signals
-        buy_opportunities.sort(key=lambda x: x[2], reverse=True)
-        for symbol, signal_result, score in buy_opportunities[:3]:
-            if self.execute_buy(symbol, signal_result):
+        top_buys = heapq.nlargest(3, buy_opportunities, key=operator.itemgetter(2))
+        if top_buys and self.enable_trading:
+            entry_arr, per_rupee = self._size_buy_candidates(top_buys)
+        else:
+            entry_arr = per_rupee = np.zeros(len(top_buys))  # dry-run: execute_buy just logs
+        for i, (symbol, signal_result, score) in enumerate(top_buys):
+            # Risk budget follows the cash left after earlier fills this scan
+            shares = int(self.available_capital * self.risk_per_trade * per_rupee[i])
+            if self.execute_buy(symbol, signal_result, entry_price=float(entry_arr[i]), shares=shares):
                 actions_log.append({
                     'type': 'BUY', 'symbol': symbol,
                     'qty': self.positions.get(symbol, {}).get('shares', 0),
@@ -1466,21 +2511,23 @@ class PerfectTraderPaperTrading:
                     'scan_total': int((scan_end - scan_start).total_seconds() * 1000)
                 }
             }
-            reporting.write_scan_audit(payload)
+            reporting.submit_scan_audit(payload)
         except Exception:
             pass
 
         if signals_found == 0 and not self.positions:
-            print("\n⚪ No trading opportunities found")
+            self._log("\n⚪ No trading opportunities found")
     
-    def print_status(self):
-        """Print current status"""
+    def print_status(self, prices: dict | None = None, now: datetime | None = None,
+                     total_value: float | None = None):
+        """Print current status (prices/now/total_value: optional values already taken this scan)"""
+        now_ts = now.timestamp() if now else time.time()
         # Calculate total portfolio value
-        total_value = self.available_capital
-        for symbol, position in self.positions.items():
-            current_price = self.get_current_price(symbol)
-            if current_price > 0:
-                total_value += position['shares'] * current_price
+        if prices is None or not prices.keys() >= self.positions.keys():
+            prices = self.get_current_prices(list(self.positions))
+            total_value = None
+        if total_value is None:
+            total_value = self._portfolio_value(prices)
                 
         total_return = (total_value - self.initial_capital) / self.initial_capital * 100
         win_rate = (self.winning_trades / self.total_trades * 100) if self.total_trades > 0 else 0
@@ -1492,10 +2539,10 @@ class PerfectTraderPaperTrading:
         
         # Show detailed position breakdown
         if self.positions:
-            print(f"\n[HOLDINGS] CURRENT POSITIONS:")
+            lines = ["\n[HOLDINGS] CURRENT POSITIONS:"]
             total_invested = 0
             for symbol, position in self.positions.items():
-                current_price = self.get_current_price(symbol)
+                current_price = prices.get(symbol, 0)
                 if current_price > 0:
                     shares = position['shares']
                     # Handle different field names for entry price
@@ -1510,22 +2557,22 @@ class PerfectTraderPaperTrading:
                     
                     total_invested += invested
                     
-                    # Calculate position age
+                    # Calculate position age (entry_ts is epoch seconds; older
+                    # snapshots only carry the ISO string written by execute_buy,
+                    # which is parsed once here and cached on the position)
+                    entry_ts = position.get('entry_ts')
                     entry_time = position.get('entry_time', '')
-                    if isinstance(entry_time, str):
-                        try:
-                            from datetime import datetime
-                            if entry_time and len(entry_time) > 10:
-                                entry_dt = datetime.fromisoformat(entry_time.replace('Z', '+00:00'))
-                                age_hours = (datetime.now(IST) - entry_dt.replace(tzinfo=IST)).total_seconds() / 3600
-                                if age_hours < 24:
-                                    age_str = f"{age_hours:.1f}h"
-                                else:
-                                    age_str = f"{age_hours/24:.1f}d"
-                            else:
-                                age_str = "N/A"
-                        except:
-                            age_str = "N/A"
+                    if entry_ts is None and isinstance(entry_time, str) and len(entry_time) > 10:
+                        entry_dt = _parse_iso(entry_time)
+                        if entry_dt.tzinfo is None:
+                            entry_dt = IST.localize(entry_dt)
+                        entry_ts = position['entry_ts'] = entry_dt.timestamp()
+                    if entry_ts is not None:
+                        age_hours = (now_ts - entry_ts) / 3600
+                        if age_hours < 24:
+                            age_str = f"{age_hours:.1f}h"
+                        else:
+                            age_str = f"{age_hours/24:.1f}d"
                     else:
                         age_str = "N/A"
                     
@@ -1538,22 +2585,26 @@ class PerfectTraderPaperTrading:
                             activation_pct = position.get('activation_percent', 0.015) * 100
                             trailing_info = f" | Trail: {activation_pct:.1f}%+"
                     
-                    print(f"   {symbol:<12} | {shares:>3} shares | Entry: Rs.{entry_price:>7.2f} | Current: Rs.{current_price:>7.2f} | P&L: {pnl:>+8.0f} ({pnl_pct:>+5.1f}%) | Age: {age_str}{trailing_info}")
+                    lines.append(_POS_FMT.format_map({
+                        'symbol': symbol, 'shares': shares, 'entry': entry_price,
+                        'cur': current_price, 'pnl': pnl, 'pnl_pct': pnl_pct,
+                        'age': age_str, 'trail': trailing_info,
+                    }))
             
-            print(f"   {'─'*85}")
-            print(f"   {'TOTAL INVESTED':<12} | Rs.{total_invested:>8.0f} | Available Cash: Rs.{self.available_capital:>8.0f}")
+            lines.append(f"   {'─'*85}")
+            lines.append(f"   {'TOTAL INVESTED':<12} | Rs.{total_invested:>8.0f} | Available Cash: Rs.{self.available_capital:>8.0f}")
+            print("\n".join(lines))
         
         if self.total_trades > 0:
             print(f"\n[STATS] TRADING PERFORMANCE:")
             print(f"   Trades: {self.total_trades} | Win Rate: {win_rate:.0f}%")
     
-    def _is_market_open(self):
-        """Check if market is currently open"""
-        now_ist = datetime.now(IST)
+    def _is_market_open(self, now: datetime | None = None):
+        """Check if market is currently open (now: optional IST timestamp reused by the caller)"""
+        now_ist = now or datetime.now(IST)
         
-        # Market hours: 9:15 AM - 3:30 PM IST, Monday-Friday
-        market_open = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
-        market_close = now_ist.replace(hour=15, minute=30, second=0, microsecond=0)
+        # Market hours: 9:15 AM - 3:30 PM IST, Monday-Friday (boundaries built once per day)
+        market_open, market_close = _market_session(now_ist.date())
         
         # Check if weekday (Monday=0, Sunday=6)
         is_weekday = now_ist.weekday() < 5
@@ -1561,21 +2612,25 @@ class PerfectTraderPaperTrading:
         
         return is_weekday and is_market_hours
     
-    def _get_market_close_time(self):
+    def _get_market_close_time(self, now: datetime | None = None):
         """Get today's market close time"""
-        now_ist = datetime.now(IST)
-        return now_ist.replace(hour=15, minute=30, second=0, microsecond=0)
+        now_ist = now or datetime.now(IST)
+        return _market_session(now_ist.date())[1]
     
-    def _time_until_market_close(self):
+    def _time_until_market_close(self, now: datetime | None = None):
         """Get minutes until market closes"""
-        if not self._is_market_open():
+        now_ist = now or datetime.now(IST)
+        if not self._is_market_open(now_ist):
             return 0
         
-        now_ist = datetime.now(IST)
-        market_close = self._get_market_close_time()
+        market_close = self._get_market_close_time(now_ist)
         remaining = (market_close - now_ist).total_seconds() / 60
         return max(0, remaining)
 
+    def stop(self):
+        """Ask a running session to finish; wakes run() out of its inter-scan wait."""
+        self._stop_event.set()
+
     def run(self, hours: float = 4.0):
         """Run paper trading session"""
         print("[BOT] PERFECT TRADER - PAPER TRADING")
@@ -1591,14 +2646,14 @@ class PerfectTraderPaperTrading:
         print(f"[#] Total Stocks: {len(self.watchlist)} (Large+Mid+Small Cap)")
         print(f"[~] Scans: All {len(self.watchlist)} stocks per cycle")
         print(f"[T] Max Duration: {hours} hours")
-        print(f"[~] Scan Interval: 10 minutes")
+        print(f"[~] Scan Interval: {SCAN_INTERVAL_SECS // 60} minutes")
         print(f"[!] Press Ctrl+C to stop")
         print("=" * 50)
         
         # Check market hours
         now_ist = datetime.now(IST)
-        if not self._is_market_open():
-            next_open = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
+        if not self._is_market_open(now_ist):
+            next_open = _market_session(now_ist.date())[0]
             if now_ist.hour >= 15:  # After market close, next day
                 next_open += timedelta(days=1)
 
@@ -1614,7 +2669,7 @@ class PerfectTraderPaperTrading:
                 print("\n[INFO] Exiting. Use --allow-after-hours for dry-run or --dry-run for scans without orders.")
                 return
         else:
-            remaining_minutes = self._time_until_market_close()
+            remaining_minutes = self._time_until_market_close(now_ist)
             print(f"\n[+] MARKET IS OPEN")
             print(f"   Current time: {now_ist.strftime('%H:%M:%S IST')}")
             print(f"   Market closes in: {remaining_minutes:.0f} minutes")
@@ -1623,51 +2678,64 @@ class PerfectTraderPaperTrading:
                 self.enable_trading = False
         
         # Check data
-        cache_dir = Path('data_cache')
-        if not cache_dir.exists():
+        if not DATA_CACHE_DIR.exists():
             print("\n❌ No data found! Run: python download_historical_data.py")
             return
         
         # Determine session end time
-        market_close = self._get_market_close_time()
-        user_end_time = datetime.now(IST) + timedelta(hours=hours)
+        market_close = self._get_market_close_time(now_ist)
+        user_end_time = now_ist + timedelta(hours=hours)
         
         # Use whichever is sooner: market close or user-specified duration
-        if self._is_market_open() and market_close < user_end_time:
+        if self._is_market_open(now_ist) and market_close < user_end_time:
             end_time = market_close
             print(f"[#] Session will end at market close: {market_close.strftime('%H:%M IST')}")
         else:
             end_time = user_end_time
             print(f"[#] Session will end in {hours} hours")
+        # Monotonic deadline: immune to NTP/wall-clock adjustments mid-session
+        deadline = time.monotonic() + max((end_time - now_ist).total_seconds(), 0.0)
+
+        # Stream prices for the session instead of polling LTP every scan
+        if self.use_live_data and self.live_api and self._is_market_open():
+            self.live_api.start_ticker(self.watchlist + list(self.positions))
         
         scan_count = 0
+
+        # SIGTERM (service stop) ends the session like Ctrl+C, without waiting out the sleep
+        previous_sigterm = None
+        try:
+            previous_sigterm = signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        except ValueError:
+            pass  # not on the main thread; stop() still works
         
         try:
-            while datetime.now(IST) < end_time:
+            while time.monotonic() < deadline and not self._stop_event.is_set():
                 scan_count += 1
                 # Increment persistent daily counter
                 today_count = self._increment_daily_scan_counter()
                 print(f"\n[SCAN] #{scan_count} | Today: {today_count}")
                 
                 # Check if market just closed during session
-                if self._is_market_open() and datetime.now(IST) >= self._get_market_close_time():
+                scan_before = datetime.now(IST)
+                if self._is_market_open(scan_before) and scan_before >= self._get_market_close_time(scan_before):
                     print("\n[!] MARKET CLOSED - Ending session")
                     break
                 
-                scan_before = datetime.now(IST)
-                self.scan_and_trade()
+                self.scan_and_trade(scan_before)
+                if self.live_api is not None and self.live_api.session_rejected:
+                    print("\n[!] Zerodha session rejected - ending session. Run: python authenticate_zerodha.py")
+                    break
                 scan_after = datetime.now(IST)
+                # Post-scan valuation shared by the daily summary, print_status and the save
+                prices = self.get_current_prices(list(self.positions))
+                total_value = self._portfolio_value(prices)
 
                 # Update rolling daily summary
                 try:
                     # Portfolio snapshot basics
-                    total_value = self.available_capital
-                    for s, pos in self.positions.items():
-                        price = self.get_current_price(s)
-                        if price > 0:
-                            total_value += pos['shares'] * price
                     daily_update = {
-                        'date_ist': datetime.now(IST).date().isoformat(),
+                        'date_ist': scan_after.date().isoformat(),
                         'scans_today': today_count,
                         'trades_placed': self.total_trades,
                         'portfolio_snapshot': {
@@ -1677,35 +2745,36 @@ class PerfectTraderPaperTrading:
                         },
                         'unrealized_pnl': round(total_value - self.initial_capital, 2),
                     }
-                    reporting.upsert_daily_summary(daily_update)
+                    reporting.submit_daily_summary(daily_update)
                 except Exception:
                     pass
-                self.print_status()
+                self.print_status(prices, scan_after, total_value=total_value)
                 
                 # Show time until market close if market is open
-                if self._is_market_open():
-                    remaining_market = self._time_until_market_close()
-                    remaining_session = (end_time - datetime.now(IST)).total_seconds() / 60
+                if self._is_market_open(scan_after):
+                    remaining_market = self._time_until_market_close(scan_after)
+                    remaining_session = (deadline - time.monotonic()) / 60
                     
                     if remaining_market < remaining_session and remaining_market > 0:
                         print(f"\n[T] Market closes in {remaining_market:.0f} minutes")
                 
-                # Save portfolio state periodically
-                self._save_portfolio_state(is_end_of_day=False)
-                
                 # Wait for next scan
-                remaining = (end_time - datetime.now(IST)).total_seconds()
-                if remaining > 600:  # More than 10 minutes left
-                    print("\n[~] Next scan in 10 minutes...")
-                    time.sleep(600)  # 10 minutes
-                elif remaining > 0:
-                    print(f"\n[~] Session ending in {remaining/60:.0f} minutes...")
-                    time.sleep(remaining)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if remaining > SCAN_INTERVAL_SECS:
+                    print(f"\n[~] Next scan in {SCAN_INTERVAL_SECS // 60} minutes...")
                 else:
+                    print(f"\n[~] Session ending in {remaining/60:.0f} minutes...")
+                if self._stop_event.wait(min(SCAN_INTERVAL_SECS, remaining)):
+                    print("\n[!] Stop requested")
                     break
                     
         except KeyboardInterrupt:
             print("\n[!] Stopped by user")
+        finally:
+            if previous_sigterm is not None:
+                signal.signal(signal.SIGTERM, previous_sigterm)
         
         # Keep positions open - no forced closure
         if self.positions:
@@ -1722,14 +2791,17 @@ class PerfectTraderPaperTrading:
         print("=" * 50)
         self.print_status()
         self._report_data_gaps()
+        if self.live_api:
+            self.live_api.stop_ticker()
         
-        if self.trade_history:
+        trade_pnl_pcts = self.trade_history['pnl_pct']
+        if trade_pnl_pcts:
             print(f"\n[PERFORMANCE] RESULTS:")
-            avg_return = np.mean([t['pnl_pct'] for t in self.trade_history])
+            avg_return = np.mean(np.asarray(trade_pnl_pcts, dtype=np.float64))
             print(f"   Average Trade: {avg_return:+.2f}%")
             win_rate = (self.winning_trades / self.total_trades * 100) if self.total_trades else 0
             
-            if len(self.trade_history) >= 5:
+            if len(trade_pnl_pcts) >= 5:
                 if win_rate >= 60 and avg_return > 0:
                     print(f"   ✅ Good performance! Consider live testing.")
                 else:
@@ -1758,15 +2830,21 @@ class PerfectTraderPaperTrading:
         Uses the last saved portfolio snapshot without fetching live prices."""
         try:
             state_file = self.portfolio_file if hasattr(self, 'portfolio_file') else Path('paper_trading_portfolio.json')
-            if not state_file.exists():
+            try:
+                st = os.stat(state_file)
+            except FileNotFoundError:
                 print("[OPENING] No prior portfolio state found")
                 return
-            with open(state_file, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            # Skip re-parsing when the file is unchanged since _load_portfolio_state read it
+            cached = getattr(self, '_opening_snapshot', None)
+            if cached and cached[0] == st.st_mtime_ns:
+                state = cached[1]
+            else:
+                state = _json_loads(state_file.read_bytes())
 
             last_dt = None
             try:
-                last_dt = datetime.fromisoformat(state.get('last_trading_date', ''))
+                last_dt = _parse_iso(state.get('last_trading_date', ''))
             except Exception:
                 last_dt = None
             today = datetime.now(IST).date()
@@ -1818,8 +2896,7 @@ def auto_update_data():
         
         # Load watchlist
         try:
-            with open('hybrid_config.json', 'r') as f:
-                config = json.load(f)
+            config = _json_loads(Path('hybrid_config.json').read_bytes())
             symbols = config.get('watchlist', [])
         except:
             symbols = ['RELIANCE', 'TCS', 'HDFCBANK']  # Fallback
@@ -1831,22 +2908,33 @@ def auto_update_data():
             '15min': {'min_rows': 200, 'check_fresh': True},
         }
 
-        to_refresh = {tf: [] for tf in required_timeframes}
-
-        for symbol in symbols:
-            for tf, rules in required_timeframes.items():
-                meta = cache_mgr.metadata.get(f"{symbol}_{tf}", {})
-                rows = int(meta.get('rows', 0) or 0)
-                cache_file = cache_mgr.get_cache_path(symbol, tf)
-                needs_update = False
+        to_refresh = {}
 
-                if not cache_file.exists() or rows < rules['min_rows']:
-                    needs_update = True
-                elif rules['check_fresh'] and not cache_mgr.is_cache_valid(symbol, tf):
-                    needs_update = True
+        def _needs_refresh(symbol, tf, short, check_fresh):
+            if short:
+                return True
+            if check_fresh:
+                return not cache_mgr.is_cache_valid(symbol, tf)  # also requires the file to exist
+            return not cache_mgr.get_cache_path(symbol, tf).exists()
 
-                if needs_update:
-                    to_refresh[tf].append(symbol)
+        # File/freshness checks are independent per symbol: overlap them on a small pool
+        with ThreadPoolExecutor(max_workers=FRESHNESS_WORKERS, thread_name_prefix='freshness') as pool:
+            for tf, rules in required_timeframes.items():
+                # Row-count check for the whole watchlist in one compare; the file/freshness
+                # checks only run for symbols that have enough rows
+                rows = np.fromiter(
+                    (int(cache_mgr.metadata.get(f"{symbol}_{tf}", {}).get('rows', 0) or 0) for symbol in symbols),
+                    dtype=np.int64, count=len(symbols),
+                )
+                too_short = (rows < rules['min_rows']).tolist()
+                stale = pool.map(_needs_refresh, symbols, [tf] * len(symbols), too_short,
+                                 [rules['check_fresh']] * len(symbols))
+                to_refresh[tf] = [symbol for symbol, is_stale in zip(symbols, stale) if is_stale]
+
+        # Every Kite call the workers make (login check, instruments, historical data) is
+        # paced by zerodha_loader's shared schedule, so more workers never means more requests/sec
+        def _download(symbol, tf):
+            cache_mgr.download_historical_data(symbol, tf, force_download=True)
 
         refreshed_any = False
         for tf in ['daily', '60min', '15min']:
@@ -1859,13 +2947,14 @@ def auto_update_data():
             suffix = '...' if len(symbols_needed) > 5 else ''
             print(f"[AUTO] Refreshing {tf} data for {len(symbols_needed)} symbols: {preview}{suffix}")
 
-            for symbol in symbols_needed:
-                try:
-                    cache_mgr.download_historical_data(symbol, tf, force_download=True)
-                    # Light rate limit to respect API caps
-                    time.sleep(0.35)
-                except Exception as e:
-                    print(f"[AUTO] [WARNING] Failed to update {symbol} ({tf}): {e}")
+            # Timeframes stay sequential (daily -> 60min -> 15min); symbols within one run in parallel
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                futures = {pool.submit(_download, symbol, tf): symbol for symbol in symbols_needed}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"[AUTO] [WARNING] Failed to update {futures[future]} ({tf}): {e}")
 
         if not refreshed_any:
             print(f"[AUTO] [OK] All required timeframes look good")
@@ -1887,25 +2976,23 @@ def auto_authenticate_zerodha():
     print("=" * 60)
     
     try:
-        from zerodha_auth import ZerodhaAuth
+        auth = zerodha_auth.ZerodhaAuth()
         
-        auth = ZerodhaAuth()
-        
-        # Check if session is valid
+        # Check if session is valid (one /user/profile probe, so a revoked token is caught
+        # before auto_update_data uses it)
         if auth.is_session_valid():
-            kite = auth.get_kite_instance()
-            if kite:
-                try:
-                    profile = kite.profile()
-                    print(f"[AUTH] [SUCCESS] Session active for: {profile.get('user_name', 'Unknown')}")
-                    return True
-                except Exception:
-                    print(f"[AUTH] [WARNING] Saved session expired")
+            print(f"[AUTH] [SUCCESS] Saved session active")
+            return True
             
         print(f"[AUTH] [INFO] Authentication required")
         print(f"[AUTH] [TIP] Run: python authenticate_zerodha.py")
         return False
         
+    except ImportError as e:
+        # zerodha_auth is lazy, so a missing kiteconnect surfaces here rather than at startup
+        print(f"[AUTH] [ERROR] Zerodha client library unavailable: {e}")
+        print(f"[AUTH] [TIP] Install it with: pip install kiteconnect")
+        return False
     except Exception as e:
         print(f"[AUTH] [ERROR] Authentication check failed: {e}")
         print(f"[AUTH] [TIP] Run: python authenticate_zerodha.py")
@@ -1924,16 +3011,19 @@ def main():
     run_hours = 4.0
     dry_run = False
     allow_after_hours = False
+    verbose = False
     try:
         import argparse
         parser = argparse.ArgumentParser(description='Perfect Trader - Paper Trading')
         parser.add_argument('--hours', type=float, default=4.0, help='Run duration in hours (default: 4.0)')
         parser.add_argument('--dry-run', action='store_true', help='Scan only, do not place orders')
         parser.add_argument('--allow-after-hours', action='store_true', help='Allow running after market close (dry-run only)')
+        parser.add_argument('--verbose', action='store_true', help='Print each scanned symbol as it is processed')
         args = parser.parse_args()
         run_hours = float(args.hours)
         dry_run = bool(args.dry_run)
         allow_after_hours = bool(args.allow_after_hours)
+        verbose = bool(args.verbose)
     except Exception:
         pass
 
@@ -1971,7 +3061,8 @@ def main():
             use_live_data=use_live,
             force_fresh_start=False,  # Don't reset portfolio every time
             dry_run=dry_run,
-            allow_after_hours=allow_after_hours
+            allow_after_hours=allow_after_hours,
+            verbose=verbose
         )
     except ZerodhaAuthenticationError:
         print("\n[TRADING] Aborting start until authentication is completed.")
@@ -1983,4 +3074,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import atexit
 import json
 import os
+import queue
+import threading
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
 
 try:
     import pytz  # optional
@@ -25,19 +28,59 @@ def ist_now() -> datetime:
     return datetime.now(IST)
 
 
-def _atomic_write(path: Path, data: str):
+def atomic_write(path: Path, data, durable: bool = False):
+    """Write str (UTF-8) or bytes via a temp file + os.replace; durable=True also fsyncs first."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
     tmp = path.with_suffix(path.suffix + '.tmp')
-    with tmp.open('w', encoding='utf-8') as f:
+    with open(tmp, 'wb') as f:
         f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
     os.replace(tmp, path)
 
 
-def write_scan_audit(payload: Dict[str, Any]) -> Path:
+def parse_trade_log(lines: Iterable) -> List[Dict[str, Any]]:
+    """Trades from JSONL trade-log lines (str or bytes); blank or torn lines are skipped."""
+    trades = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            trades.append(json.loads(line))
+        except ValueError:
+            continue
+    return trades
+
+
+def read_trade_history(portfolio: Dict[str, Any], base_dir: Path) -> List[Dict[str, Any]]:
+    """Closed trades for a portfolio snapshot, as one dict per trade.
+
+    Current snapshots name a JSONL log relative to the portfolio file's directory
+    (base_dir); older ones embed the history, either as a list or column-wise.
+    """
+    log_name = portfolio.get('trade_history_file')
+    if log_name:
+        try:
+            with open(Path(base_dir) / log_name, 'rb') as f:
+                return parse_trade_log(f)
+        except FileNotFoundError:
+            return []
+    history = portfolio.get('trade_history', [])
+    if isinstance(history, dict):
+        # Columnar layout: {'symbol': [...], 'pnl': [...], ...} aligned by index
+        columns = list(history)
+        return [dict(zip(columns, row)) for row in zip(*history.values())]
+    return history
+
+
+def write_scan_audit(payload: Dict[str, Any], when: Optional[datetime] = None) -> Path:
     """Write a per-scan audit JSON file. Returns the path written."""
     ensure_dirs()
-    ts = ist_now().strftime('%Y%m%d_%H%M%S')
+    ts = (when or ist_now()).strftime('%Y%m%d_%H%M%S')
     path = AUDIT_DIR / f'scan_{ts}.json'
-    _atomic_write(path, json.dumps(payload, ensure_ascii=False, indent=2))
+    atomic_write(path, json.dumps(payload, ensure_ascii=False, indent=2))
     return path
 
 
@@ -85,15 +128,83 @@ def _merge_daily(existing: Dict[str, Any], update: Dict[str, Any]) -> Dict[str,
     return out
 
 
-def upsert_daily_summary(update: Dict[str, Any]) -> Path:
-    """Merge update into today's daily summary and write atomically."""
+def _upsert_daily(date_str: str, updates) -> Path:
+    """Merge updates (in order) into one day's summary with a single read and write."""
     ensure_dirs()
-    date_str = update.get('date_ist') or ist_now().date().isoformat()
     path = DAILY_DIR / f'{date_str}.json'
     try:
         existing = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
     except Exception:
         existing = {}
-    merged = _merge_daily(existing, update)
-    _atomic_write(path, json.dumps(merged, ensure_ascii=False, indent=2))
+    for update in updates:
+        existing = _merge_daily(existing, update)
+    atomic_write(path, json.dumps(existing, ensure_ascii=False, indent=2))
     return path
+
+
+def upsert_daily_summary(update: Dict[str, Any]) -> Path:
+    """Merge update into today's daily summary and write atomically."""
+    date_str = update.get('date_ist') or ist_now().date().isoformat()
+    return _upsert_daily(date_str, [update])
+
+
+# Background writer so the scan loop never waits on report I/O. Started on first
+# submit; pending reports are flushed at interpreter exit.
+_report_queue = queue.Queue()
+_report_thread = None
+_report_start_lock = threading.Lock()
+
+
+def _write_batch(batch):
+    daily = {}
+    for kind, item, when in batch:
+        if kind == 'scan':
+            write_scan_audit(item, when)
+        else:
+            date_str = item.get('date_ist') or when.date().isoformat()
+            daily.setdefault(date_str, []).append(item)
+    # Several queued summary updates for a day collapse into one read-merge-write
+    for date_str, updates in daily.items():
+        _upsert_daily(date_str, updates)
+
+
+def _report_worker():
+    while True:
+        batch = [_report_queue.get()]
+        while True:
+            try:
+                batch.append(_report_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as exc:
+            print(f"[REPORT] Failed to write reports: {exc}")
+        finally:
+            for _ in batch:
+                _report_queue.task_done()
+
+
+def _submit(kind: str, item: Dict[str, Any]):
+    global _report_thread
+    with _report_start_lock:
+        if _report_thread is None:
+            _report_thread = threading.Thread(target=_report_worker, name='report-writer', daemon=True)
+            _report_thread.start()
+            atexit.register(flush)
+    _report_queue.put((kind, item, ist_now()))
+
+
+def submit_scan_audit(payload: Dict[str, Any]):
+    """Queue write_scan_audit(payload); the file is stamped with the submit time."""
+    _submit('scan', payload)
+
+
+def submit_daily_summary(update: Dict[str, Any]):
+    """Queue upsert_daily_summary(update)."""
+    _submit('daily', update)
+
+
+def flush():
+    """Block until every queued report has been written."""
+    _report_queue.join()
@@ -23,6 +23,8 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, BASE_DIR)
 sys.path.insert(0, '/home/skshanawaz21/public_html/inditehealthcare.com')
 
+from reports import reporting
+
 app = Flask(__name__)
 
 # CORS configuration for shared hosting
@@ -80,9 +82,8 @@ def load_portfolio():
         }
 
 def load_trade_history():
-    """Load trade history from portfolio data"""
-    portfolio = load_portfolio()
-    return portfolio.get('trade_history', [])
+    """Load trade history from the JSONL trade log (or legacy portfolio data)"""
+    return reporting.read_trade_history(load_portfolio(), PORTFOLIO_FILE.parent)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Character trie for NSE tradingsymbol lookups.
+
+Nodes are plain dicts keyed by character; the resolved tradingsymbol of a
+complete key is stored under the ``_END`` marker. Plain dicts keep the
+structure picklable so it can travel with the instruments cache.
+"""
+
+_END = '\0'
+
+
+class SymbolTrie:
+    """Maps user-facing symbols (and aliases) to Zerodha tradingsymbols."""
+
+    def __init__(self, root: dict | None = None):
+        self.root = root if root is not None else {}
+
+    @classmethod
+    def build(cls, valid_symbols, symbol_mapping: dict) -> 'SymbolTrie':
+        """Build from exchange symbols plus alias -> tradingsymbol mapping."""
+        trie = cls()
+        for alias, target in symbol_mapping.items():
+            trie.insert(alias, target)
+        # Real symbols win over aliases that happen to collide with them
+        for symbol in valid_symbols:
+            trie.insert(symbol, symbol)
+        return trie
+
+    def insert(self, key: str, value: str):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_END] = value
+
+    def get(self, key: str) -> str | None:
+        """Exact lookup; None on miss."""
+        node = self.root
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node.get(_END)
+
+    def prefixes(self, key: str) -> list[tuple[str, str]]:
+        """(matched_prefix, value) for every stored prefix of key, longest first."""
+        node = self.root
+        found = []
+        for i, ch in enumerate(key):
+            node = node.get(ch)
+            if node is None:
+                break
+            if _END in node:
+                found.append((key[:i + 1], node[_END]))
+        found.reverse()
+        return found
+
+    def get_with_suffix(self, key: str, suffixes) -> str | None:
+        """Value of the longest stored prefix whose remainder of key is exactly one of suffixes."""
+        for prefix, value in self.prefixes(key):
+            if key[len(prefix):] in suffixes:
+                return value
+        return None
+
+    def __bool__(self):
+        return bool(self.root)
@@ -0,0 +1,32 @@
+from symbol_trie import SymbolTrie
+
+# Same series suffixes paper_trading.validate_symbol accepts
+SERIES_SUFFIXES = frozenset({'EQ', '-EQ'})
+
+
+def make_trie():
+    return SymbolTrie.build(['ABC', 'ABCE', 'RELIANCE'], {'ABC-EQ': 'ABC'})
+
+
+def test_prefixes_longest_first():
+    assert make_trie().prefixes('ABCEQ') == [('ABCE', 'ABCE'), ('ABC', 'ABC')]
+
+
+def test_suffix_match_falls_back_to_shorter_prefix():
+    # Longest prefix ABCE leaves 'Q'; ABC + 'EQ' is the valid reading
+    assert make_trie().get_with_suffix('ABCEQ', SERIES_SUFFIXES) == 'ABC'
+
+
+def test_suffix_match_accepts_dash_series():
+    assert make_trie().get_with_suffix('RELIANCE-EQ', SERIES_SUFFIXES) == 'RELIANCE'
+
+
+def test_suffix_match_rejects_invalid_remainder():
+    # Ends in EQ, but 'XEQ' / 'XYEQ' are not series suffixes
+    trie = make_trie()
+    assert trie.get_with_suffix('ABCXEQ', SERIES_SUFFIXES) is None
+    assert trie.get_with_suffix('RELIANCEXYEQ', SERIES_SUFFIXES) is None
+
+
+def test_suffix_match_requires_a_suffix():
+    assert make_trie().get_with_suffix('ABCX', SERIES_SUFFIXES) is None
@@ -0,0 +1,126 @@
+import json
+
+from paper_trading import PerfectTraderPaperTrading, TRADE_HISTORY_FILENAME
+from reports import reporting
+
+
+def make_engine(tmp_path, dry_run=False, force_fresh_start=False):
+    # Only the attributes the trade-log helpers touch; skips config, data and broker setup
+    engine = PerfectTraderPaperTrading.__new__(PerfectTraderPaperTrading)
+    engine.trade_history_file = tmp_path / TRADE_HISTORY_FILENAME
+    engine.dry_run_configured = dry_run
+    engine.force_fresh_start = force_fresh_start
+    engine._trade_log_size = 0
+    return engine
+
+
+def trade_line(symbol, pnl):
+    return (json.dumps({'symbol': symbol, 'pnl': pnl, 'pnl_pct': 1.0, 'reason': 'TP'}) + '\n').encode()
+
+
+def test_embedded_history_is_migrated_to_log(tmp_path):
+    engine = make_engine(tmp_path)
+    embedded = [{'symbol': 'ABC', 'pnl': 10, 'pnl_pct': 1.0, 'reason': 'TP'},
+                {'symbol': 'XYZ', 'pnl': -5, 'pnl_pct': -0.5, 'reason': 'SL'}]
+
+    history = engine._load_trade_history(embedded)
+
+    assert history['symbol'] == ['ABC', 'XYZ']
+    lines = engine.trade_history_file.read_bytes().splitlines()
+    assert [json.loads(line)['symbol'] for line in lines] == ['ABC', 'XYZ']
+    assert engine._trade_log_size == engine.trade_history_file.stat().st_size
+
+
+def test_dry_run_does_not_migrate(tmp_path):
+    engine = make_engine(tmp_path, dry_run=True)
+
+    history = engine._load_trade_history([{'symbol': 'ABC', 'pnl': 10, 'pnl_pct': 1.0, 'reason': 'TP'}])
+
+    assert history['symbol'] == ['ABC']
+    assert not engine.trade_history_file.exists()
+
+
+def test_trades_past_snapshot_are_orphaned(tmp_path):
+    engine = make_engine(tmp_path)
+    kept, extra = trade_line('ABC', 10), trade_line('XYZ', 20)
+    engine.trade_history_file.write_bytes(kept + extra)
+
+    history = engine._load_trade_history(snapshot_bytes=len(kept))
+
+    assert history['symbol'] == ['ABC']
+    assert engine.trade_history_file.read_bytes() == kept
+    assert engine._trade_log_size == len(kept)
+    assert (tmp_path / 'trade_history.orphaned.jsonl').read_bytes() == extra
+
+
+def test_dry_run_leaves_log_past_snapshot_untouched(tmp_path):
+    engine = make_engine(tmp_path, dry_run=True)
+    log = trade_line('ABC', 10) + trade_line('XYZ', 20)
+    engine.trade_history_file.write_bytes(log)
+
+    engine._load_trade_history(snapshot_bytes=len(trade_line('ABC', 10)))
+
+    assert engine.trade_history_file.read_bytes() == log
+    assert not (tmp_path / 'trade_history.orphaned.jsonl').exists()
+
+
+def test_short_log_is_not_modified(tmp_path):
+    engine = make_engine(tmp_path)
+    log = trade_line('ABC', 10)
+    engine.trade_history_file.write_bytes(log)
+
+    history = engine._load_trade_history(snapshot_bytes=len(log) + 100)
+
+    assert history['symbol'] == ['ABC']
+    assert engine.trade_history_file.read_bytes() == log
+
+
+def test_fresh_start_archives_trade_log(tmp_path):
+    engine = make_engine(tmp_path, force_fresh_start=True)
+    engine.trade_history_file.write_bytes(trade_line('ABC', 10))
+    engine._trade_log_size = engine.trade_history_file.stat().st_size
+
+    engine._load_portfolio_state()
+
+    assert not engine.trade_history_file.exists()
+    assert engine._trade_log_size == 0
+    archived = list(tmp_path.glob('trade_history.*.jsonl'))
+    assert len(archived) == 1 and archived[0].read_bytes() == trade_line('ABC', 10)
+
+
+def test_dry_run_fresh_start_keeps_trade_log(tmp_path):
+    engine = make_engine(tmp_path, dry_run=True, force_fresh_start=True)
+    engine.trade_history_file.write_bytes(trade_line('ABC', 10))
+
+    engine._load_portfolio_state()
+
+    assert engine.trade_history_file.read_bytes() == trade_line('ABC', 10)
+
+
+def test_torn_log_line_is_skipped(tmp_path):
+    engine = make_engine(tmp_path)
+    engine.trade_history_file.write_bytes(trade_line('ABC', 10) + b'{"symbol": "XY')
+
+    history = engine._load_trade_history()
+
+    assert history['symbol'] == ['ABC']
+
+
+def test_dashboard_reader_uses_snapshot_log(tmp_path):
+    (tmp_path / TRADE_HISTORY_FILENAME).write_bytes(trade_line('ABC', 10) + b'\n' + trade_line('XYZ', 20))
+
+    trades = reporting.read_trade_history({'trade_history_file': TRADE_HISTORY_FILENAME}, tmp_path)
+
+    assert [t['symbol'] for t in trades] == ['ABC', 'XYZ']
+
+
+def test_dashboard_reader_missing_log(tmp_path):
+    assert reporting.read_trade_history({'trade_history_file': TRADE_HISTORY_FILENAME}, tmp_path) == []
+
+
+def test_dashboard_reader_accepts_legacy_columns(tmp_path):
+    portfolio = {'trade_history': {'symbol': ['ABC', 'XYZ'], 'pnl': [10, 20]}}
+
+    trades = reporting.read_trade_history(portfolio, tmp_path)
+
+    assert trades == [{'symbol': 'ABC', 'pnl': 10}, {'symbol': 'XYZ', 'pnl': 20}]
@@ -0,0 +1,33 @@
+from paper_trading import PerfectTraderPaperTrading
+
+
+def make_engine(**position):
+    # Only the attributes update_trailing_stops touches
+    engine = PerfectTraderPaperTrading.__new__(PerfectTraderPaperTrading)
+    engine._scan_log = []
+    engine._pos_dirty = False
+    engine._portfolio_dirty = False
+    engine.positions = {'ABC': {'entry_price': 100.0, 'stop_loss': 95.0,
+                                'trailing_stop_enabled': True, **position}}
+    return engine
+
+
+def test_new_high_marks_snapshot_dirty():
+    engine = make_engine()
+    engine.update_trailing_stops({'ABC': 101.0})
+    assert engine.positions['ABC']['highest_price'] == 101.0
+    assert engine._portfolio_dirty
+
+
+def test_raised_stop_marks_snapshot_dirty():
+    engine = make_engine(highest_price=100.0)
+    engine.update_trailing_stops({'ABC': 110.0})
+    pos = engine.positions['ABC']
+    assert pos['trailing_activated'] and pos['stop_loss'] > 95.0
+    assert engine._portfolio_dirty
+
+
+def test_unchanged_position_stays_clean():
+    engine = make_engine(highest_price=100.0)
+    engine.update_trailing_stops({'ABC': 99.0})
+    assert not engine._portfolio_dirty
@@ -13,9 +13,23 @@ from pathlib import Path
 from urllib.parse import urlparse, parse_qs
 import pytz
 from kiteconnect import KiteConnect
+from urllib3.util.retry import Retry
 
 IST = pytz.timezone('Asia/Kolkata')
 
+# Keep-alive pool + retry policy for every Kite HTTPS session we create
+KITE_POOL = {
+    'pool_connections': 4,
+    'pool_maxsize': 16,
+    'max_retries': Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+}
+
+
+def new_kite_client(api_key: str) -> KiteConnect:
+    """KiteConnect whose requests session reuses pooled, retrying connections."""
+    return KiteConnect(api_key=api_key, pool=KITE_POOL)
+
+
 class ZerodhaAuth:
     def auto_authenticate(self):
         """
@@ -132,7 +146,7 @@ class ZerodhaAuth:
         """
         try:
             # Initialize KiteConnect
-            self.kite = KiteConnect(api_key=self.api_key)
+            self.kite = new_kite_client(self.api_key)
             
             # Generate login URL
             login_url = self.kite.login_url()
@@ -230,9 +244,12 @@ class ZerodhaAuth:
         except Exception as e:
             print(f"❌ Failed to save session: {e}")
     
-    def load_session(self):
+    def load_session(self, validate: bool = True):
         """
         Load and validate existing session
+
+        validate=False trusts the saved 6 AM expiry and skips the /user/profile probe;
+        callers that do so must handle a rejected token on their first real API call.
         """
         try:
             if not self.session_file.exists():
@@ -257,18 +274,21 @@ class ZerodhaAuth:
             # Restore session
             self.access_token = session_data['access_token']
             
-            # Test session
-            self.kite = KiteConnect(api_key=self.api_key)
+            # Attach the token (an existing client keeps its pooled connections)
+            if self.kite is None or getattr(self.kite, 'api_key', None) != self.api_key:
+                self.kite = new_kite_client(self.api_key)
             self.kite.set_access_token(self.access_token)
             
-            # Validate with API call
-            profile = self.kite.profile()
+            # Validate with API call (a revoked token raises and the session file is removed)
+            user_name = session_data.get('user_name', 'Unknown')
+            if validate:
+                user_name = self.kite.profile().get('user_name', user_name)
             
             time_left = expires_at - now
             hours, remainder = divmod(time_left.total_seconds(), 3600)
             minutes = remainder // 60
             
-            print(f"✅ Session restored for: {profile['user_name']}")
+            print(f"✅ Session restored for: {user_name}")
             print(f"⏰ Expires in: {int(hours)}h {int(minutes)}m")
             
             return True
@@ -339,9 +359,9 @@ class ZerodhaAuth:
         except Exception as e:
             print(f"❌ Error clearing session: {e}")
     
-    def get_kite_instance(self):
+    def get_kite_instance(self, validate: bool = True):
         """
-        Get authenticated KiteConnect instance
+        Get authenticated KiteConnect instance (validate: see load_session)
         """
         if self.kite and self.access_token:
             return self.kite
@@ -351,7 +371,7 @@ class ZerodhaAuth:
             self.load_credentials()
         
         # Try to load existing session
-        if self.load_session():
+        if self.load_session(validate=validate):
             return self.kite
             
         return None
@@ -10,10 +10,31 @@ import pytz
 import logging
 from pathlib import Path
 import json
+import threading
+import time
 from zerodha_auth import ZerodhaAuth
+from reports import reporting
 
 IST = pytz.timezone('Asia/Kolkata')
 
+# Kite allows 3 requests per second per API key (historical data included); every
+# loader call is spaced this far apart process-wide, however many threads download
+KITE_REQUESTS_PER_SEC = 3.0
+_kite_pace_lock = threading.Lock()
+_kite_next_slot = 0.0
+
+
+def _pace_kite_request():
+    """Block until this thread's slot in the shared Kite request schedule comes up."""
+    global _kite_next_slot
+    with _kite_pace_lock:
+        now = time.monotonic()
+        slot = max(_kite_next_slot, now)
+        _kite_next_slot = slot + 1.0 / KITE_REQUESTS_PER_SEC
+    if slot > now:
+        time.sleep(slot - now)
+
+
 class EnhancedHybridDataLoader:
     """
     Enhanced data loader that uses Zerodha KiteConnect API
@@ -29,6 +50,13 @@ class EnhancedHybridDataLoader:
         # Instruments cache (reduce heavy API calls and enable robust matching)
         self._instruments_cache_path = Path('instruments_nse.json')
         self._instruments = None  # Loaded on demand
+        # One loader may serve several download threads: login and the instruments
+        # fetch/cache write happen once, under this lock
+        self._setup_lock = threading.RLock()
+        self._token_index_src = None  # instruments list the lookup index below was built from
+        self._token_by_symbol = {}
+        self._token_by_name = {}
+        self._symbol_rows = []
         
     def _load_symbol_map(self):
         """Load NSE symbol mappings for Zerodha"""
@@ -93,20 +121,31 @@ class EnhancedHybridDataLoader:
             'TATAMOTORS': 'TATAMOTORS'
         }
     
+    def _kite_call(self, method: str, *args, **kwargs):
+        """Kite REST call paced to KITE_REQUESTS_PER_SEC across all threads."""
+        _pace_kite_request()
+        return getattr(self.kite, method)(*args, **kwargs)
+
     def _ensure_authenticated(self):
         """Ensure we have a valid Zerodha connection"""
-        if self.kite is None:
+        if self.kite is not None:
+            return
+        with self._setup_lock:
+            if self.kite is not None:
+                return
             try:
-                # Try to get authenticated kite instance
-                self.kite = self.auth.get_kite_instance()
-                if self.kite is None:
+                # Try to get authenticated kite instance (the profile call below is the check)
+                kite = self.auth.get_kite_instance(validate=False)
+                if kite is None:
                     raise Exception("Authentication required")
                     
                 # Test the connection
-                profile = self.kite.profile()
+                self.kite = kite
+                profile = self._kite_call('profile')
                 logging.info(f"[AUTH] Connected to Zerodha as: {profile.get('user_name', 'Unknown')}")
                 
             except Exception as e:
+                self.kite = None
                 logging.error(f"[AUTH] Authentication failed: {e}")
                 print(f"[ERROR] Zerodha authentication failed: {e}")
                 print("[TIP] Run: python authenticate_zerodha.py")
@@ -125,32 +164,38 @@ class EnhancedHybridDataLoader:
     def _save_instruments_cache(self, instruments: list):
         """Persist instruments to local cache"""
         try:
-            json.dump(instruments, self._instruments_cache_path.open('w', encoding='utf-8'), ensure_ascii=False)
+            # Temp file + rename: a reader never sees a half-written list
+            reporting.atomic_write(self._instruments_cache_path, json.dumps(instruments, ensure_ascii=False, default=str))
         except Exception as e:
             logging.debug(f"[INSTRUMENTS] Failed to save cache: {e}")
 
-    def _get_all_instruments(self) -> list:
-        """Fetch NSE instruments once and cache them for faster lookup"""
-        if self._instruments is not None:
+    def _get_all_instruments(self, stale: list | None = None) -> list:
+        """Fetch NSE instruments once and cache them for faster lookup (stale: list to reload)"""
+        if self._instruments is not None and self._instruments is not stale:
             return self._instruments
-        # Try load cache first
-        self._load_instruments_cache()
-        if self._instruments is not None:
+        with self._setup_lock:
+            # Another thread may have loaded (or already reloaded) the list while we waited
+            if self._instruments is not None and self._instruments is not stale:
+                return self._instruments
+            self._instruments = None
+            # Try load cache first
+            self._load_instruments_cache()
+            if self._instruments is not None:
+                return self._instruments
+            # Fallback to API
+            try:
+                self._ensure_authenticated()
+                instruments = self._kite_call('instruments', "NSE")
+                # Basic validation
+                if isinstance(instruments, list) and instruments:
+                    self._instruments = instruments
+                    self._save_instruments_cache(instruments)
+                    return instruments
+            except Exception as e:
+                logging.error(f"[INSTRUMENTS] Failed to fetch instruments from API: {e}")
+            # As a last resort, return empty list
+            self._instruments = []
             return self._instruments
-        # Fallback to API
-        try:
-            self._ensure_authenticated()
-            instruments = self.kite.instruments("NSE")
-            # Basic validation
-            if isinstance(instruments, list) and instruments:
-                self._instruments = instruments
-                self._save_instruments_cache(instruments)
-                return instruments
-        except Exception as e:
-            logging.error(f"[INSTRUMENTS] Failed to fetch instruments from API: {e}")
-        # As a last resort, return empty list
-        self._instruments = []
-        return self._instruments
     
     def get_historical_data(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
         """
@@ -189,7 +234,8 @@ class EnhancedHybridDataLoader:
             logging.info(f"[DOWNLOAD] Fetching {symbol} {interval} data from {start_date} to {end_date}")
             
             # Download data from Zerodha
-            data = self.kite.historical_data(
+            data = self._kite_call(
+                'historical_data',
                 instrument_token=instrument_token,
                 from_date=start_date,
                 to_date=end_date,
@@ -229,6 +275,21 @@ class EnhancedHybridDataLoader:
             logging.error(f"[ERROR] Failed to download {symbol} data: {e}")
             raise Exception(f"Data download failed for {symbol}: {e}")
     
+    def _build_token_index(self, instruments: list):
+        """Index tradingsymbol/name -> token once so lookups skip per-row scans."""
+        symbols = [str(ins.get('tradingsymbol', '')).upper() for ins in instruments]
+        names = [str(ins.get('name', '')).upper().replace(' ', '').replace('-', '') for ins in instruments]
+        tokens = [ins.get('instrument_token') for ins in instruments]
+        by_symbol, by_name = {}, {}
+        for ts, name, token in zip(symbols, names, tokens):
+            # setdefault keeps the first row, matching the old first-hit scans
+            by_symbol.setdefault(ts, token)
+            by_name.setdefault(name, token)
+        self._token_by_symbol = by_symbol
+        self._token_by_name = by_name
+        self._symbol_rows = list(zip(symbols, tokens))
+        self._token_index_src = instruments
+
     def _get_instrument_token(self, symbol: str) -> int:
         """Get instrument token for a symbol with robust matching and caching"""
         try:
@@ -237,43 +298,36 @@ class EnhancedHybridDataLoader:
                 logging.error("[INSTRUMENTS] Empty instruments list; cannot resolve token")
                 return None
 
+            if self._token_index_src is not instruments:
+                self._build_token_index(instruments)
+
             sym = symbol.upper()
             sym_eq = sym if sym.endswith('-EQ') else f"{sym}-EQ"
 
-            # 1) Exact tradingsymbol match
-            for ins in instruments:
-                ts = ins.get('tradingsymbol', '').upper()
-                if ts == sym:
-                    return ins.get('instrument_token')
-
-            # 2) Try -EQ series match
-            for ins in instruments:
-                ts = ins.get('tradingsymbol', '').upper()
-                if ts == sym_eq:
-                    return ins.get('instrument_token')
+            # 1) Exact tradingsymbol match, 2) -EQ series match
+            for key in (sym, sym_eq):
+                if key in self._token_by_symbol:
+                    return self._token_by_symbol[key]
 
             # 3) Fuzzy match against name (remove spaces and hyphens)
             target = sym.replace('-', '').replace(' ', '')
-            for ins in instruments:
-                name = str(ins.get('name', '')).upper().replace(' ', '').replace('-', '')
-                if name == target:
-                    return ins.get('instrument_token')
+            if target in self._token_by_name:
+                return self._token_by_name[target]
 
             # 4) Startswith match on tradingsymbol as a last resort
-            for ins in instruments:
-                ts = ins.get('tradingsymbol', '').upper()
+            for ts, token in self._symbol_rows:
                 if ts.startswith(sym):
-                    return ins.get('instrument_token')
+                    return token
 
             # If still not found, try refresh instruments once
             logging.warning(f"[INSTRUMENTS] Token not found for {symbol}. Refreshing cache and retrying...")
             # Force refresh
-            self._instruments = None
-            instruments = self._get_all_instruments()
-            for ins in instruments:
-                ts = ins.get('tradingsymbol', '').upper()
-                if ts in (sym, sym_eq):
-                    return ins.get('instrument_token')
+            instruments = self._get_all_instruments(stale=instruments)
+            if self._token_index_src is not instruments:
+                self._build_token_index(instruments)
+            for key in (sym, sym_eq):
+                if key in self._token_by_symbol:
+                    return self._token_by_symbol[key]
 
             logging.error(f"[ERROR] Could not find instrument token for {symbol}")
             return None
@@ -294,7 +348,7 @@ class EnhancedHybridDataLoader:
                 raise Exception(f"Could not find instrument token for {symbol}")
             
             # Get live quote
-            quote = self.kite.quote(f"NSE:{nse_symbol}")
+            quote = self._kite_call('quote', f"NSE:{nse_symbol}")
             
             if f"NSE:{nse_symbol}" in quote:
                 data = quote[f"NSE:{nse_symbol}"]